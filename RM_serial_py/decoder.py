@@ -0,0 +1,107 @@
+try:
+    from RM_serial_py.crc import crc8, crc16
+except ImportError:  # 在RM_serial_py目录下直接运行示例脚本
+    from crc import crc8, crc16
+
+SOF = 0xA5
+FRAME_HEADER_LEN = 5  # 帧头长度（SOF + 数据长度 + 序列号 + CRC8校验码）
+CMD_ID_LEN = 2  # 命令码长度
+FRAME_TAIL_LEN = 2  # 帧尾长度（CRC16校验码）
+
+
+# 命令码统一为整数，兼容ser_api中[高字节, 低字节]的写法
+def cmd_id_value(cmd_id):
+    if isinstance(cmd_id, int):
+        return cmd_id
+    return (cmd_id[0] << 8) | cmd_id[1]
+
+
+# 裁判系统数据流解析器：按帧头中的数据长度切帧，每帧只解析一次，再按命令码分发给注册的处理函数
+# 帧头CRC8或整帧CRC16校验失败时跳过当前SOF向后重新同步，不会因为数据或校验码中出现0xA5而切错帧
+class FrameDecoder:
+    def __init__(self, max_data_length=512):
+        self.max_data_length = max_data_length  # 超过该长度的帧头视为错误帧头
+        self.buffer = bytearray()
+        self.handlers = {}  # 命令码 -> 处理函数handler(data, seq)
+        self.on_frame = None  # 每个校验通过的帧都会调用on_frame(cmd_id, data, seq)，用于记录/离线分析
+        self.frames = 0  # 校验通过的帧数
+        self.unhandled = 0  # 没有注册处理函数的帧数
+        self.crc8_errors = 0  # 帧头CRC8校验失败次数
+        self.crc16_errors = 0  # 整帧CRC16校验失败次数
+        self.resyncs = 0  # 重新同步次数
+        self.discarded = 0  # 丢弃的字节数
+        self.handler_errors = 0  # 处理函数抛出异常的次数
+
+    # 注册命令码的处理函数，cmd_id可以是0x020E或[0x02, 0x0E]
+    def register(self, cmd_id, handler):
+        self.handlers[cmd_id_value(cmd_id)] = handler
+
+    # 放入新收到的串口数据，解析出所有完整的帧并分发，返回本次解析出的帧数
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        count = 0
+        pos = 0
+        with memoryview(buffer) as view:
+            while True:
+                sof_index = buffer.find(SOF, pos)
+                if sof_index == -1:
+                    self.discarded += len(buffer) - pos
+                    pos = len(buffer)
+                    break
+                self.discarded += sof_index - pos
+                pos = sof_index
+                if len(buffer) - pos < FRAME_HEADER_LEN:
+                    break  # 帧头不完整，等待更多数据
+
+                # 校验帧头
+                data_length = buffer[pos + 1] | (buffer[pos + 2] << 8)
+                if crc8(view[pos:pos + 4]) != buffer[pos + 4] or data_length > self.max_data_length:
+                    self.crc8_errors += 1
+                    self._resync()
+                    pos += 1
+                    continue
+                frame_len = FRAME_HEADER_LEN + CMD_ID_LEN + data_length + FRAME_TAIL_LEN
+                if len(buffer) - pos < frame_len:
+                    break  # 帧不完整，等待更多数据
+
+                # 校验整帧
+                tail = pos + frame_len - FRAME_TAIL_LEN
+                if crc16(view[pos:tail]) != buffer[tail] | (buffer[tail + 1] << 8):
+                    self.crc16_errors += 1
+                    self._resync()
+                    pos += 1
+                    continue
+
+                cmd_id = buffer[pos + 5] | (buffer[pos + 6] << 8)
+                seq = buffer[pos + 3]
+                payload = bytes(view[pos + FRAME_HEADER_LEN + CMD_ID_LEN:tail])
+                pos += frame_len
+                self.frames += 1
+                count += 1
+                self.dispatch(cmd_id, payload, seq)
+        # 移除已处理的数据
+        del buffer[:pos]
+        return count
+
+    def _resync(self):
+        self.resyncs += 1
+        self.discarded += 1
+
+    def dispatch(self, cmd_id, data, seq):
+        if self.on_frame is not None:
+            self.on_frame(cmd_id, data, seq)
+        handler = self.handlers.get(cmd_id)
+        if handler is None:
+            self.unhandled += 1
+            return
+        try:
+            handler(data, seq)
+        except Exception as r:
+            self.handler_errors += 1
+            print('命令码0x%04X处理失败 %s' % (cmd_id, r))
+
+    def stats(self):
+        return {'frames': self.frames, 'unhandled': self.unhandled, 'crc8_errors': self.crc8_errors,
+                'crc16_errors': self.crc16_errors, 'resyncs': self.resyncs, 'discarded': self.discarded,
+                'handler_errors': self.handler_errors}
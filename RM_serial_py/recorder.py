@@ -0,0 +1,136 @@
+import datetime
+import glob
+import os
+import queue
+import struct
+import threading
+import time
+
+try:
+    from RM_serial_py.decoder import FrameDecoder
+except ImportError:  # 在RM_serial_py目录下直接运行
+    from decoder import FrameDecoder
+
+# 串口原始数据日志格式：文件头 MAGIC + 每条记录 (单调时间戳f64, 方向u8, 长度u32) + 数据
+MAGIC = b'RMSERLOG\x01'
+RECORD_STRUCT = struct.Struct('<dBI')
+RX = 0  # 接收（裁判系统 -> 雷达）
+TX = 1  # 发送（雷达 -> 裁判系统）
+
+
+# 串口数据记录器：串口线程只把(时间, 方向, 数据)放进队列，后台线程批量写盘，按大小分文件
+# 队列满时丢弃并计数，串口收发永远不会因为磁盘阻塞
+class SerialRecorder:
+    def __init__(self, log_dir, max_bytes=64 * 2 ** 20, max_pending=10000, prefix='serial'):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes  # 单个文件大小上限，超过后新建文件
+        self.prefix = prefix
+        self.queue = queue.Queue(max_pending)
+        self.file = None
+        self.file_bytes = 0
+        self.file_index = 0
+        self.timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.records = 0  # 已写入记录数
+        self.dropped = 0  # 因队列满丢弃的记录数
+        self.running = True
+        os.makedirs(log_dir, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # 记录一段串口数据（串口线程调用）
+    def record(self, direction, data):
+        try:
+            self.queue.put_nowait((time.monotonic(), direction, bytes(data)))
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.log_dir, '%s_%s_%03d.bin' % (self.prefix, self.timestamp, self.file_index))
+        self.file_index += 1
+        self.file = open(path, 'wb', buffering=1 << 16)
+        self.file.write(MAGIC)
+        self.file_bytes = len(MAGIC)
+
+    def run(self):
+        self._open()
+        while self.running or not self.queue.empty():
+            try:
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                self.file.flush()
+                continue
+            # 一次取出队列中已有的所有记录，合并写入
+            items = [item]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for t, direction, data in items:
+                if self.file_bytes >= self.max_bytes:
+                    self._open()
+                self.file.write(RECORD_STRUCT.pack(t, direction, len(data)))
+                self.file.write(data)
+                self.file_bytes += RECORD_STRUCT.size + len(data)
+            self.records += len(items)
+        self.file.close()
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+
+
+# 读取日志，逐条返回(时间, 方向, 数据)；文件末尾不完整的记录（异常退出时）忽略
+def read_log(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('不是串口日志文件: %s' % path)
+        while True:
+            head = f.read(RECORD_STRUCT.size)
+            if len(head) < RECORD_STRUCT.size:
+                return
+            t, direction, length = RECORD_STRUCT.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield t, direction, data
+
+
+# 按文件名顺序读取一次运行的所有分文件，pattern如 save_video/xxx/serial/serial_20250520_201745_*.bin
+def read_logs(pattern):
+    for path in sorted(glob.glob(pattern)):
+        yield from read_log(path)
+
+
+# 某一方向的全部原始字节（用于simulator回放）
+def log_stream(pattern, direction=RX):
+    return b''.join(data for _, d, data in read_logs(pattern) if d == direction)
+
+
+# 重建数据帧，逐帧返回(时间, 方向, 命令码, 数据, 包序号)，时间为帧最后一个字节到达的记录时间
+def decode_log(pattern):
+    decoders = {RX: FrameDecoder(), TX: FrameDecoder()}
+    frames = []
+    for decoder in decoders.values():
+        decoder.on_frame = lambda cmd_id, data, seq: frames.append((cmd_id, data, seq))
+    for t, direction, data in read_logs(pattern):
+        decoders[direction].feed(data)
+        for cmd_id, payload, seq in frames:
+            yield t, direction, cmd_id, payload, seq
+        frames.clear()
+
+
+if __name__ == "__main__":
+    # 打印日志中的所有数据帧
+    import sys
+
+    if len(sys.argv) < 2:
+        print('用法: python recorder.py "save_video/xxx/serial/serial_*.bin"')
+        sys.exit(1)
+    start = None
+    for t, direction, cmd_id, data, seq in decode_log(sys.argv[1]):
+        start = t if start is None else start
+        print('%9.3f %s 0x%04X seq=%3d %s' % (t - start, 'RX' if direction == RX else 'TX', cmd_id, seq,
+                                             data.hex(' ')))
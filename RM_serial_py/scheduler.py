@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import threading
+import time
+
+try:
+    from RM_serial_py.ser_api import build_send_packet
+    from RM_serial_py.decoder import cmd_id_value
+    from RM_serial_py.transport import LatencyHistogram
+    from RM_serial_py.recorder import TX
+except ImportError:  # 在RM_serial_py目录下直接运行示例脚本
+    from ser_api import build_send_packet
+    from decoder import cmd_id_value
+    from transport import LatencyHistogram
+    from recorder import TX
+
+PRIORITY_URGENT = 0  # 时效性强的数据包，如双倍易伤请求
+PRIORITY_NORMAL = 1  # 周期发送的数据包，如雷达坐标
+
+
+# 令牌桶：每秒补充rate个令牌，最多存burst个，发一包消耗一个
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    # 距离有一个令牌还要等多久（秒）
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+# 周期发送任务：到点时调用build生成数据部分，返回None则本周期不发
+# 指定layout（ser_api.PacketLayout）时build返回数据字段的值，直接pack进预分配的数据包
+class PeriodicJob:
+    def __init__(self, cmd_id, interval, build, priority=PRIORITY_NORMAL, layout=None):
+        self.cmd_id = cmd_id
+        self.layout = layout
+        self.interval = interval
+        self.build = build
+        self.priority = priority
+        self.deadline = time.monotonic()
+        self.skipped = 0  # 落后超过一个周期而跳过的次数
+        self.lateness = LatencyHistogram()  # 实际发送时间相对截止时间的延迟
+
+
+# 上行发送调度器：独占串口写，按命令码用令牌桶限制带宽（裁判系统对每个命令码有频率上限）
+# 紧急数据包优先于周期数据包发送；周期任务的截止时间按单调时钟累加，不受打包和写串口耗时影响，长时间运行不漂移
+class UplinkScheduler:
+    def __init__(self, ser, seq=0, recorder=None):
+        self.ser = ser
+        self.recorder = recorder  # 串口数据记录器，为None不记录
+        self.seq = seq  # 所有数据包共用的包序号
+        self.buckets = {}  # 命令码 -> 令牌桶
+        self.jobs = []
+        self.queue = []  # 待发的单次数据包 (优先级, 顺序, 命令码, 数据, 提交时间)
+        self.order = itertools.count()
+        self.cond = threading.Condition()
+        self.sent = {}  # 命令码 -> 已发送包数
+        self.queue_latency = LatencyHistogram()  # 单次数据包从提交到写出的延迟
+        self.write_errors = 0
+        self.running = False
+        self.thread = None
+
+    # 设置命令码的发送频率上限（包/秒），没有设置的命令码不限速
+    # burst略大于1：周期任务偶尔晚发时保留这点令牌，否则令牌桶和周期同频时延迟会逐周期累积
+    def add_channel(self, cmd_id, rate, burst=1.2):
+        self.buckets[cmd_id_value(cmd_id)] = TokenBucket(rate, burst)
+
+    # 添加周期发送任务，interval为发送周期（秒）
+    def periodic(self, cmd_id, interval, build, priority=PRIORITY_NORMAL, layout=None):
+        job = PeriodicJob(cmd_id, interval, build, priority, layout)
+        with self.cond:
+            self.jobs.append(job)
+            self.cond.notify()
+        return job
+
+    # 提交一个单次数据包，默认最高优先级
+    def submit(self, cmd_id, data, priority=PRIORITY_URGENT):
+        with self.cond:
+            heapq.heappush(self.queue, (priority, next(self.order), cmd_id, data, time.monotonic()))
+            self.cond.notify()
+
+    def _bucket_wait(self, cmd_id, now):
+        bucket = self.buckets.get(cmd_id_value(cmd_id))
+        return 0.0 if bucket is None else bucket.wait_time(now)
+
+    # 选出当前可以发送的优先级最高的一项，没有则返回(None, 需要等待的时间)
+    # 单次数据包按优先级顺序找第一个有令牌的，令牌用完的命令码不挡住后面其他命令码的数据包
+    def _next(self, now):
+        best = None
+        wait = 1.0
+        for entry in sorted(self.queue):
+            bucket_wait = self._bucket_wait(entry[2], now)
+            if bucket_wait <= 0:
+                best = (entry[0], 0, 'queue', entry)
+                break
+            wait = min(wait, bucket_wait)
+        for job in self.jobs:
+            due = job.deadline - now
+            if due > 0:
+                wait = min(wait, due)
+                continue
+            bucket_wait = self._bucket_wait(job.cmd_id, now)
+            if bucket_wait > 0:
+                wait = min(wait, bucket_wait)
+            elif best is None or job.priority < best[0]:
+                best = (job.priority, 1, 'job', job)
+        return best, wait
+
+    def run(self):
+        self.running = True
+        while self.running:
+            with self.cond:
+                now = time.monotonic()
+                best, wait = self._next(now)
+                if best is None:
+                    self.cond.wait(max(wait, 0.001))
+                    continue
+                _, _, kind, job = best
+                if kind == 'queue':
+                    self.queue.remove(job)
+                    heapq.heapify(self.queue)
+                    _, _, cmd_id, data, submit_time = job
+                    self.queue_latency.add(now - submit_time)
+                else:
+                    cmd_id = job.cmd_id
+                    job.lateness.add(now - job.deadline)
+                    # 截止时间按周期累加，落后超过一个周期则跳过错过的周期
+                    job.deadline += job.interval
+                    while job.deadline <= now:
+                        job.deadline += job.interval
+                        job.skipped += 1
+                    data = None
+            # 打包和写串口不持有锁，避免阻塞submit
+            try:
+                if kind == 'job':
+                    data = job.build()
+                if data is None:
+                    continue
+                # 确定要发送后才消耗令牌，build返回None的周期不占用带宽（令牌桶只在本线程使用）
+                bucket = self.buckets.get(cmd_id_value(cmd_id))
+                if bucket is not None:
+                    bucket.take(now)
+                if kind == 'job' and job.layout is not None:
+                    packet, self.seq = job.layout.build(self.seq, *data)
+                else:
+                    packet, self.seq = build_send_packet(data, self.seq, cmd_id)
+                self.ser.write(packet)
+                if self.recorder is not None:
+                    self.recorder.record(TX, packet)
+                key = cmd_id_value(cmd_id)
+                self.sent[key] = self.sent.get(key, 0) + 1
+            except Exception as r:
+                self.write_errors += 1
+                print('发送失败 %s' % r)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def format_stats(self):
+        sent = ' '.join('0x%04X:%d' % (cmd_id, count) for cmd_id, count in sorted(self.sent.items()))
+        jobs = ' '.join('0x%04X late p99 %.2fms skip:%d' % (cmd_id_value(job.cmd_id), job.lateness.percentile(99) * 1e3,
+                                                          job.skipped) for job in self.jobs)
+        return 'uplink %s | %s | queue p99 %.2fms err:%d' % (sent, jobs, self.queue_latency.percentile(99) * 1e3,
+                                                              self.write_errors)
@@ -1,5 +1,10 @@
 import struct
 
+try:
+    from RM_serial_py.crc import crc8, crc16
+except ImportError:  # 在RM_serial_py目录下直接运行示例脚本
+    from crc import crc8, crc16
+
 # CRC8校验表
 
 mapping_table = {
@@ -76,7 +81,7 @@ wCRC_Table = [
 ]
 
 
-# CRC8校验
+# CRC8校验（只用于4字节帧头，逐字节查表比转bytes再调用crc8快）
 def Get_CRC8_Check_Sum(pchMessage, dwLength):
     ucCRC8 = CRC8_INIT
     for ch in pchMessage[:dwLength]:
@@ -85,80 +90,48 @@ def Get_CRC8_Check_Sum(pchMessage, dwLength):
     return ucCRC8
 
 
-# CRC16校验
+# CRC16校验，查表计算见crc.py
 def Get_CRC16_Check_Sum(pchMessage, dwLength):
-    wCRC = CRC_INIT
-    for ch in pchMessage[:dwLength]:
-        wCRC = ((wCRC >> 8) & 0xFF) ^ wCRC_Table[(wCRC ^ ch) & 0xFF]
-    return wCRC
-
-
-# 雷达数据部分构建示例
-def build_data_radar(target_robot_id, target_position_x, target_position_y):
-    data = bytearray()
-    data.extend(bytearray(struct.pack('H', target_robot_id)))  # 目标机器人ID (小端)
-    data.extend(bytearray(struct.pack('f', target_position_x)))  # x坐标 (小端)
-    data.extend(bytearray(struct.pack('f', target_position_y)))  # y坐标 (小端)
-    return data
-
-
-# 雷达数据部分构建示例
-def build_data_radar_all(send_map,state):
-    if state == 'R':
-        data = bytearray()
-        data.extend(bytearray(struct.pack('H', int(send_map['B1'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B1'][1]))))  # y坐标 (小端)
-
-        data.extend(bytearray(struct.pack('H', int(send_map['B2'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B2'][1]))))  # y坐标 (小端)
-
-        data.extend(bytearray(struct.pack('H', int(send_map['B3'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B3'][1]))))  # y坐标 (小端)
+    return crc16(bytes(pchMessage[:dwLength]))
 
-        data.extend(bytearray(struct.pack('H', int(send_map['B4'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B4'][1]))))  # y坐标 (小端)
 
-        data.extend(bytearray(struct.pack('H', int(send_map['B5'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B5'][1]))))  # y坐标 (小端)
+# 帧结构：帧头(SOF, 数据长度, 包序号, CRC8) + 命令码 + 数据 + CRC16，全部小端
+SOF = 0xA5
+HEADER_STRUCT = struct.Struct('<BHB')  # 帧头中参与CRC8的部分
+CMD_ID_STRUCT = struct.Struct('<H')
+CRC16_STRUCT = struct.Struct('<H')
+FRAME_HEADER_LEN = 5
+FRAME_OVERHEAD = FRAME_HEADER_LEN + CMD_ID_STRUCT.size + CRC16_STRUCT.size
 
-        data.extend(bytearray(struct.pack('H', int(send_map['B7'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['B7'][1]))))  # y坐标 (小端)
-    else:
-        data = bytearray()
-        data.extend(bytearray(struct.pack('H', int(send_map['R1'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R1'][1]))))  # y坐标 (小端)
+# 数据部分的预编译格式
+RADAR_STRUCT = struct.Struct('<Hff')  # 目标机器人ID, x坐标, y坐标
+RADAR_ALL_STRUCT = struct.Struct('<12H')  # 6台机器人的x, y坐标
+DECISION_STRUCT = struct.Struct('<HHHB')  # 子内容ID 0x0121, 发送者ID, 接收者ID 0x8080(裁判系统), 双倍易伤请求次数
+RADAR_ALL_NAMES = {'R': ('B1', 'B2', 'B3', 'B4', 'B5', 'B7'), 'B': ('R1', 'R2', 'R3', 'R4', 'R5', 'R7')}
 
-        data.extend(bytearray(struct.pack('H', int(send_map['R2'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R2'][1]))))  # y坐标 (小端)
 
-        data.extend(bytearray(struct.pack('H', int(send_map['R3'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R3'][1]))))  # y坐标 (小端)
+# 雷达数据部分构建示例
+def build_data_radar(target_robot_id, target_position_x, target_position_y):
+    return bytearray(RADAR_STRUCT.pack(target_robot_id, target_position_x, target_position_y))
 
-        data.extend(bytearray(struct.pack('H', int(send_map['R4'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R4'][1]))))  # y坐标 (小端)
 
-        data.extend(bytearray(struct.pack('H', int(send_map['R5'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R5'][1]))))  # y坐标 (小端)
+# 雷达数据所有对方机器人坐标，按send_map中的顺序展开
+def radar_all_values(send_map, state):
+    values = []
+    for name in RADAR_ALL_NAMES['R' if state == 'R' else 'B']:
+        values.append(int(send_map[name][0]))  # x坐标
+        values.append(int(send_map[name][1]))  # y坐标
+    return values
 
-        data.extend(bytearray(struct.pack('H', int(send_map['R7'][0]))))  # x坐标 (小端)
-        data.extend(bytearray(struct.pack('H', int(send_map['R7'][1]))))  # y坐标 (小端)
 
-    return data
+# 雷达数据部分构建示例
+def build_data_radar_all(send_map, state):
+    return bytearray(RADAR_ALL_STRUCT.pack(*radar_all_values(send_map, state)))
 
 
+def build_data_decision(chances, state):
+    return bytearray(DECISION_STRUCT.pack(0x0121, 9 if state == 'R' else 109, 0x8080, chances))
 
-def build_data_decision(chances,state):
-    data = bytearray()
-    cmd_id = [0x01, 0x21]
-    cmd_id = bytearray([cmd_id[1], cmd_id[0]])
-    data.extend(cmd_id)
-    if state == 'R':
-        data.extend(bytearray(struct.pack('H', 9)))
-    else:
-        data.extend(bytearray(struct.pack('H', 109)))
-    data.extend(bytearray([0x80,0x80]))
-    data.extend(bytearray(struct.pack('B', chances)))
-    return data
 
 def build_data_sentry(send_map,state):
     data = bytearray()
@@ -188,20 +161,53 @@ def build_data_sentry(send_map,state):
 # 完整数据包构建
 def build_send_packet(data, seq, cmd_id):
     data_length = len(data)  # 数据部分长度
-    frame_header = bytearray([0xA5])  # SOF
-    cmd_id = bytearray([cmd_id[1], cmd_id[0]])
-    frame_header.extend(struct.pack('H', data_length))  # 编码数据长度 (小端)
-    frame_header.append(seq)  # seq
-    crc8 = Get_CRC8_Check_Sum(frame_header, 4)
-    frame_header.append(crc8)  # CRC8校验码
-    frame_tail = bytearray()
+    packet = bytearray(FRAME_OVERHEAD + data_length)
+    HEADER_STRUCT.pack_into(packet, 0, SOF, data_length, seq)
+    packet[4] = crc8(bytes(packet[:4]))  # CRC8校验码
+    CMD_ID_STRUCT.pack_into(packet, 5, (cmd_id[0] << 8) | cmd_id[1])
+    packet[7:7 + data_length] = data
     # 帧尾CRC16校验
-    frame_tail.extend(struct.pack('H', Get_CRC16_Check_Sum(frame_header + cmd_id + data,
-                                                           len(frame_header + cmd_id + data) + 1)))
-    packet = frame_header + cmd_id + data + frame_tail
+    CRC16_STRUCT.pack_into(packet, 7 + data_length, crc16(bytes(packet[:7 + data_length])))
     return packet, (seq + 1) % 256
 
 
+# 固定格式数据包：帧头、命令码预先写入复用的缓冲区，每次只pack_into数据部分并计算一次CRC16
+# 帧头的CRC8只和包序号有关，按256个序号预先算好
+# build返回的是内部缓冲区，下一次build前要写出去
+class PacketLayout:
+    def __init__(self, cmd_id, data_struct):
+        self.cmd_id = cmd_id
+        self.data_struct = data_struct
+        self.size = FRAME_OVERHEAD + data_struct.size
+        self.buffer = bytearray(self.size)
+        self.view = memoryview(self.buffer)
+        self.crc16_end = self.size - CRC16_STRUCT.size
+        header = bytearray(4)
+        self.header_crc8 = bytearray(256)
+        for seq in range(256):
+            HEADER_STRUCT.pack_into(header, 0, SOF, data_struct.size, seq)
+            self.header_crc8[seq] = crc8(bytes(header))
+        HEADER_STRUCT.pack_into(self.buffer, 0, SOF, data_struct.size, 0)
+        CMD_ID_STRUCT.pack_into(self.buffer, 5, (cmd_id[0] << 8) | cmd_id[1])
+
+    # 用数据字段的值直接构建完整数据包，返回(数据包, 下一个包序号)
+    def build(self, seq, *values):
+        buffer = self.buffer
+        buffer[3] = seq
+        buffer[4] = self.header_crc8[seq]
+        self.data_struct.pack_into(buffer, 7, *values)
+        CRC16_STRUCT.pack_into(buffer, self.crc16_end, crc16(self.view[:self.crc16_end]))
+        return buffer, (seq + 1) % 256
+
+
+# 数据包格式注册表
+PACKET_LAYOUTS = {
+    'radar': PacketLayout([0x03, 0x05], RADAR_STRUCT),
+    'radar_all': PacketLayout([0x03, 0x05], RADAR_ALL_STRUCT),
+    'decision': PacketLayout([0x03, 0x01], DECISION_STRUCT),
+}
+
+
 # 单个数据包的特定命令码解析
 def receive_packet(serial_data, expected_cmd_id, info):
     # 定义常量
@@ -288,4 +294,46 @@ def Radar_decision(byte_data):
     # print(f"双倍易伤机会: {double_vulnerability_chance}")
     # print(f"对方正在被触发双倍易伤: {opponent_double_vulnerability}")
     # print(f"保留位: {reserved_bits}")
-    return double_vulnerability_chance, opponent_double_vulnerability
\ No newline at end of file
+    return double_vulnerability_chance, opponent_double_vulnerability
+
+
+if __name__ == "__main__":
+    # 对比测试：原逐字段extend+两次拼接的构建方式 vs 预编译格式
+    import time
+
+    def build_data_radar_all_old(send_map, state):
+        data = bytearray()
+        for name in RADAR_ALL_NAMES[state]:
+            data.extend(bytearray(struct.pack('H', int(send_map[name][0]))))
+            data.extend(bytearray(struct.pack('H', int(send_map[name][1]))))
+        return data
+
+    def build_send_packet_old(data, seq, cmd_id):
+        frame_header = bytearray([0xA5])
+        cmd_id = bytearray([cmd_id[1], cmd_id[0]])
+        frame_header.extend(struct.pack('H', len(data)))
+        frame_header.append(seq)
+        frame_header.append(Get_CRC8_Check_Sum(frame_header, 4))
+        frame_tail = bytearray()
+        frame_tail.extend(struct.pack('H', Get_CRC16_Check_Sum(frame_header + cmd_id + data,
+                                                               len(frame_header + cmd_id + data) + 1)))
+        return frame_header + cmd_id + data + frame_tail, (seq + 1) % 256
+
+    send_map = {name: (i * 100 + 1, i * 50 + 2) for i, name in enumerate(mapping_table)}
+    layout = PACKET_LAYOUTS['radar_all']
+    for seq in range(256):
+        expected = build_send_packet_old(build_data_radar_all_old(send_map, 'R'), seq, [0x03, 0x05])[0]
+        assert build_send_packet(build_data_radar_all(send_map, 'R'), seq, [0x03, 0x05])[0] == expected
+        assert layout.build(seq, *radar_all_values(send_map, 'R'))[0] == expected
+    old_decision = bytearray([0x21, 0x01]) + struct.pack('H', 109) + bytearray([0x80, 0x80]) + struct.pack('B', 2)
+    assert build_data_decision(2, 'B') == old_decision
+
+    repeat = 20000
+    for name, func in (('原实现', lambda: build_send_packet_old(build_data_radar_all_old(send_map, 'R'), 1, [0x03, 0x05])),
+                       ('build_send_packet', lambda: build_send_packet(build_data_radar_all(send_map, 'R'), 1,
+                                                                       [0x03, 0x05])),
+                       ('PacketLayout', lambda: layout.build(1, *radar_all_values(send_map, 'R')))):
+        ts = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        print('0x0305 雷达坐标数据包 %-18s %.2fus' % (name, (time.perf_counter() - ts) / repeat * 1e6))
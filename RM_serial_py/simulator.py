@@ -0,0 +1,185 @@
+import argparse
+import glob
+import random
+import statistics
+import threading
+import time
+
+try:
+    from RM_serial_py.ser_api import build_send_packet, PACKET_LAYOUTS
+    from RM_serial_py.transport import SerialTransport
+    from RM_serial_py.scheduler import UplinkScheduler
+    from RM_serial_py.recorder import MAGIC, log_stream
+except ImportError:  # 在RM_serial_py目录下直接运行
+    from ser_api import build_send_packet, PACKET_LAYOUTS
+    from transport import SerialTransport
+    from scheduler import UplinkScheduler
+    from recorder import MAGIC, log_stream
+
+
+# 进程内的假串口，接口与serial.Serial中用到的部分一致：read/in_waiting/write/timeout
+# 接收方向的数据由feed放入（回放线程），发送方向写入的数据带时间戳记录在written中
+class FakeSerial:
+    def __init__(self, timeout=1):
+        self.timeout = timeout
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.written = []  # (时间, 数据)
+        self.closed = False
+
+    def feed(self, data):
+        with self.cond:
+            self.rx += data
+            self.cond.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, size=1):
+        with self.cond:
+            self.cond.wait_for(lambda: self.rx or self.closed, self.timeout)
+            data = bytes(self.rx[:size])
+            del self.rx[:size]
+            return data
+
+    def read_all(self):
+        return self.read(len(self.rx))
+
+    def write(self, data):
+        self.written.append((time.perf_counter(), bytes(data)))
+        return len(data)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+# 生成模拟的裁判系统数据流：标记进度0x020C、双倍易伤0x020E、飞镖目标0x0105循环发送
+def synthetic_stream(frames=3000, seed=0):
+    rng = random.Random(seed)
+    stream = bytearray()
+    seq = 0
+    for i in range(frames):
+        kind = i % 3
+        if kind == 0:
+            packet, seq = build_send_packet(bytes([rng.randrange(256)]), seq, [0x02, 0x0C])
+        elif kind == 1:
+            packet, seq = build_send_packet(bytes([rng.randrange(8)]), seq, [0x02, 0x0E])
+        else:
+            packet, seq = build_send_packet(bytes(rng.randrange(256) for _ in range(6)), seq, [0x01, 0x05])
+        stream += packet
+    return bytes(stream)
+
+
+# 注入噪声：随机插入垃圾字节（含0xA5）、截断帧、翻转比特，rate为每个帧边界处出现一次干扰的概率
+def inject_noise(stream, rate=0.05, seed=0):
+    rng = random.Random(seed)
+    out = bytearray()
+    pos = 0
+    while pos < len(stream):
+        nxt = stream.find(b'\xA5', pos + 1)
+        nxt = len(stream) if nxt == -1 else nxt
+        chunk = bytearray(stream[pos:nxt])
+        if rng.random() < rate:
+            noise = rng.randrange(3)
+            if noise == 0:
+                out += bytes([0xA5]) + bytes(rng.randrange(256) for _ in range(rng.randrange(12)))  # 垃圾字节
+            elif noise == 1:
+                chunk = chunk[:rng.randrange(1, len(chunk) + 1)]  # 截断帧
+            else:
+                chunk[rng.randrange(len(chunk))] ^= 1 << rng.randrange(8)  # 比特翻转
+        out += chunk
+        pos = nxt
+    return bytes(out)
+
+
+# 按串口速率回放字节流：speed为相对实际波特率的倍速，0为不限速（测解析吞吐量）
+# 每次写入chunk字节，模拟串口驱动一次交付的数据量
+def replay(ser, stream, baudrate=115200, speed=1.0, chunk=64):
+    bytes_per_second = baudrate / 10.0 * speed  # 8N1每字节10位
+    start = time.perf_counter()
+    for pos in range(0, len(stream), chunk):
+        if speed > 0:
+            delay = start + pos / bytes_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        ser.feed(stream[pos:pos + chunk])
+
+
+# 解析吞吐量：不限速回放数据流，经SerialTransport解析分发
+def bench_receive(stream, speed=0.0, chunk=64):
+    ser = FakeSerial(timeout=0.1)
+    transport = SerialTransport(ser)
+    received = [0]
+
+    def handler(data, seq):
+        received[0] += 1
+
+    for cmd_id in (0x020C, 0x020E, 0x0105):
+        transport.register(cmd_id, handler)
+    transport.start()
+    ts = time.perf_counter()
+    replay(ser, stream, speed=speed, chunk=chunk)
+    # 等待全部数据解析完毕
+    while transport.bytes_read < len(stream):
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - ts
+    transport.stop()
+    transport.thread.join()
+    stats = transport.decoder.stats()
+    print('接收: %d字节 %.3fs  %.0f帧/s  %.2fMB/s  解析成功 %d  %s' % (
+        len(stream), elapsed, stats['frames'] / elapsed, len(stream) / elapsed / 2 ** 20, received[0], stats))
+    print('接收延迟', transport.latency.format())
+    return stats
+
+
+# 发送抖动：UplinkScheduler按rate周期发送0x0305，统计实际发送间隔
+def bench_send(seconds=3.0, rate=5.0):
+    ser = FakeSerial()
+    uplink = UplinkScheduler(ser)
+    uplink.add_channel([0x03, 0x05], rate=rate)
+    uplink.periodic([0x03, 0x05], 1.0 / rate, lambda: [0] * 12, layout=PACKET_LAYOUTS['radar_all'])
+    uplink.start()
+    time.sleep(seconds)
+    uplink.stop()
+    times = [t for t, _ in ser.written]
+    intervals = [b - a for a, b in zip(times, times[1:])]
+    if len(intervals) < 2:
+        print('发送: 数据不足')
+        return
+    jitter = [abs(i - 1.0 / rate) * 1e3 for i in intervals]
+    drift = (times[-1] - times[0] - (len(times) - 1) / rate) * 1e3
+    print('发送: %d包  间隔均值 %.3fms  标准差 %.3fms  最大抖动 %.3fms  累计漂移 %.3fms' % (
+        len(times), statistics.mean(intervals) * 1e3, statistics.stdev(intervals) * 1e3, max(jitter), drift))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='裁判系统串口回放/模拟测试')
+    parser.add_argument('--file', default='', help='回放的裁判系统原始字节流文件或串口日志（可用通配符），不指定则生成模拟数据')
+    parser.add_argument('--frames', type=int, default=30000, help='模拟数据帧数')
+    parser.add_argument('--speed', type=float, default=0.0, help='回放倍速，0为不限速')
+    parser.add_argument('--chunk', type=int, default=64, help='每次交付的字节数')
+    parser.add_argument('--noise', type=float, default=0.0, help='噪声注入概率')
+    parser.add_argument('--send-seconds', type=float, default=3.0, help='发送抖动测试时长')
+    parser.add_argument('--send-rate', type=float, default=5.0, help='发送频率')
+    parser.add_argument('--seed', type=int, default=0, help='模拟数据和噪声的随机种子，相同种子结果可复现')
+    opt = parser.parse_args()
+
+    is_log = False
+    if opt.file and glob.glob(opt.file):
+        with open(sorted(glob.glob(opt.file))[0], 'rb') as f:
+            is_log = f.read(len(MAGIC)) == MAGIC
+    if is_log:
+        stream = log_stream(opt.file)  # recorder记录的串口日志，回放接收方向的数据
+    elif opt.file:
+        with open(opt.file, 'rb') as f:
+            stream = f.read()
+    else:
+        stream = synthetic_stream(opt.frames, opt.seed)
+    if opt.noise > 0:
+        stream = inject_noise(stream, opt.noise, opt.seed)
+    bench_receive(stream, opt.speed, opt.chunk)
+    if opt.send_seconds > 0:
+        bench_send(opt.send_seconds, opt.send_rate)
@@ -0,0 +1,119 @@
+import os
+import selectors
+import threading
+import time
+
+try:
+    from RM_serial_py.decoder import FrameDecoder
+    from RM_serial_py.recorder import RX
+except ImportError:  # 在RM_serial_py目录下直接运行示例脚本
+    from decoder import FrameDecoder
+    from recorder import RX
+
+
+# 延迟直方图：按2的幂分桶（微秒），记录开销固定，用于统计p50/p95/p99
+class LatencyHistogram:
+    def __init__(self, buckets=24):
+        self.counts = [0] * (buckets + 1)  # 第i个桶为[2^(i-1), 2^i)微秒，最后一个桶收纳更大的值
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    # 记录一次延迟（秒）
+    def add(self, seconds):
+        us = int(seconds * 1e6)
+        self.counts[min(us.bit_length(), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    # 分位数（秒），取所在桶的上界
+    def percentile(self, p):
+        if not self.total:
+            return 0.0
+        rank = p / 100.0 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def format(self):
+        return 'n=%d mean %.2fms p50 %.2fms p95 %.2fms p99 %.2fms max %.2fms' % (
+            self.total, self.mean() * 1e3, self.percentile(50) * 1e3, self.percentile(95) * 1e3,
+            self.percentile(99) * 1e3, self.max * 1e3)
+
+
+# 事件驱动的串口接收：串口有数据可读时立即唤醒，读出全部数据交给帧解析器，不再定时轮询
+# POSIX串口用selectors等待可读；Windows的串口句柄不能select，改为阻塞读（有数据或超时即返回）
+# latency统计从读到数据到对应帧的处理函数执行完毕的耗时
+class SerialTransport:
+    def __init__(self, ser, decoder=None, recorder=None):
+        self.ser = ser
+        self.decoder = decoder if decoder is not None else FrameDecoder()
+        self.recorder = recorder  # 串口数据记录器，为None不记录
+        self.latency = LatencyHistogram()
+        self.read_time = 0.0  # 最近一次读到数据的时间
+        self.bytes_read = 0
+        self.running = False
+        self.thread = None
+
+    # 注册命令码的处理函数，包装一层记录接收到处理完成的延迟
+    def register(self, cmd_id, handler):
+        def timed_handler(data, seq):
+            handler(data, seq)
+            self.latency.add(time.perf_counter() - self.read_time)
+
+        self.decoder.register(cmd_id, timed_handler)
+
+    def _selector(self):
+        if os.name == 'nt' or not hasattr(self.ser, 'fileno'):
+            return None
+        try:
+            selector = selectors.DefaultSelector()
+            selector.register(self.ser.fileno(), selectors.EVENT_READ)
+            return selector
+        except (OSError, ValueError):
+            return None
+
+    # 在当前线程中循环接收，直到stop
+    def run(self):
+        self.running = True
+        selector = self._selector()
+        while self.running:
+            try:
+                if selector is not None and not selector.select(timeout=0.1):
+                    continue
+                # 阻塞读至少1字节，已到达的数据一次读完
+                data = self.ser.read(max(self.ser.in_waiting, 1))
+            except Exception as r:
+                print('串口读取失败', r)
+                time.sleep(1)
+                continue
+            if not data:
+                continue
+            self.read_time = time.perf_counter()
+            if self.recorder is not None:
+                self.recorder.record(RX, data)
+            self.decoder.feed(data)
+            self.bytes_read += len(data)  # 已读取并解析完的字节数
+        if selector is not None:
+            selector.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.running = False
+
+    def format_stats(self):
+        stats = self.decoder.stats()
+        return 'serial %dB frames:%d crc_err:%d resync:%d | latency %s' % (
+            self.bytes_read, stats['frames'], stats['crc8_errors'] + stats['crc16_errors'], stats['resyncs'],
+            self.latency.format())
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from radar import RadarConfig, RadarPipeline
+
+
+# 进程峰值内存（MB），Linux/macOS用resource，Windows有psutil时用psutil，都没有返回None
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # macOS单位为字节，Linux为KB
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2 ** 20
+    except ImportError:
+        return None
+
+
+# 各级耗时的分位数统计（毫秒）
+def summarize(times):
+    times = np.asarray(times) * 1000
+    if not len(times):
+        return {}
+    return {'mean': round(float(times.mean()), 3), 'p50': round(float(np.percentile(times, 50)), 3),
+            'p95': round(float(np.percentile(times, 95)), 3), 'p99': round(float(np.percentile(times, 99)), 3),
+            'max': round(float(times.max()), 3)}
+
+
+# 离线性能测试：按顺序把录像的每一帧送入 机器人检测 -> 装甲板检测 -> 透视变换 -> 滤波，不显示、不连串口
+def bench(opt):
+    capture = cv2.VideoCapture(opt.video)
+    ok, frame = capture.read()
+    if not ok:
+        raise RuntimeError('无法读取视频 %s' % opt.video)
+
+    # 与main.py相同的识别流程，不连串口、不画检测框
+    config = RadarConfig(state=opt.state, usart=False, save_img=False, ui=False, weights_path=opt.car_weights,
+                         weights_path_next=opt.armor_weights, car_data=opt.car_data, armor_data=opt.armor_data,
+                         car_img_size=opt.car_size, armor_img_size=opt.armor_size,
+                         arrays_path=opt.arrays or None, mask_path=opt.mask, device_preprocess=opt.device_preprocess,
+                         map_lut=opt.lut_step > 0, lut_step=opt.lut_step, tracker=opt.tracker,
+                         car_tracking=bool(opt.car_tracking), car_keyframe=bool(opt.keyframe),
+                         field_roi=bool(opt.field_roi), car_tiling=bool(opt.tiling), tile_size=opt.tile_size,
+                         max_tiles=opt.max_tiles)
+    radar = RadarPipeline(config)
+    if config.map_lut:
+        radar.load_map_lut(frame.shape)
+    if config.field_roi:
+        radar.load_field(frame.shape)
+
+    stages = ('read', 'car', 'armor', 'map', 'total')
+    times = {name: [] for name in stages}
+    counts = {'cars': 0, 'armors': 0}
+    frames = 0
+    start = None
+    while ok:
+        t0 = time.perf_counter()
+        # 与RadarPipeline.step相同，分级计时
+        item = radar.car_stage(radar.new_item(frame, time.time()))
+        t1 = time.perf_counter()
+        item = radar.armor_stage(item)
+        t2 = time.perf_counter()
+        item = radar.map_stage(item)
+        t3 = time.perf_counter()
+
+        frames += 1
+        # 前warmup帧用于模型预热，不计入统计
+        if frames > opt.warmup:
+            if start is None:
+                start = t0
+            times['car'].append(t1 - t0)
+            times['armor'].append(t2 - t1)
+            times['map'].append(t3 - t2)
+            counts['cars'] += len(item['car_crops'])
+            counts['armors'] += len(item['armor_points'])
+
+        t4 = time.perf_counter()
+        ok, frame = capture.read()
+        t5 = time.perf_counter()
+        if frames > opt.warmup:
+            times['read'].append(t5 - t4)
+            times['total'].append(t5 - t0)
+        # 读完下一帧再退出，保证各级的采样数一致
+        if opt.frames and frames >= opt.frames + opt.warmup:
+            break
+    capture.release()
+
+    measured = max(frames - opt.warmup, 0)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return {
+        'video': opt.video,
+        'config': {'car_weights': opt.car_weights, 'armor_weights': opt.armor_weights, 'state': opt.state,
+                   'device_preprocess': bool(opt.device_preprocess), 'tracker': opt.tracker,
+                   'lut_step': opt.lut_step, 'car_tracking': bool(opt.car_tracking), 'keyframe': bool(opt.keyframe),
+                   'car_size': opt.car_size, 'armor_size': opt.armor_size,
+                   'field_roi': bool(opt.field_roi), 'tiling': bool(opt.tiling), 'tile_size': opt.tile_size,
+                   'max_tiles': opt.max_tiles, 'device': str(radar.detector.device)},
+        'frames': measured,
+        'fps': round(measured / elapsed, 2) if elapsed > 0 else 0.0,
+        'cars_per_frame': round(counts['cars'] / max(measured, 1), 2),
+        'armors_per_frame': round(counts['armors'] / max(measured, 1), 2),
+        'stages_ms': {name: summarize(times[name]) for name in stages},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser(description='雷达识别流水线离线性能测试，结果以JSON输出')
+    parser.add_argument('--video', required=True, help='录像文件，如main.py保存的save_video/.../raw/screen_*.avi')
+    parser.add_argument('--car-weights', default='models/car.engine', help='机器人检测模型')
+    parser.add_argument('--armor-weights', default='models/armor.engine', help='装甲板检测模型')
+    parser.add_argument('--car-data', default='yaml/car.yaml')
+    parser.add_argument('--armor-data', default='yaml/armor.yaml')
+    parser.add_argument('--car-size', type=int, default=640, help='机器人检测模型输入尺寸')
+    parser.add_argument('--armor-size', type=int, default=640, help='装甲板检测模型输入尺寸')
+    parser.add_argument('--state', default='R', choices=['R', 'B'], help='己方阵营，决定使用的标定矩阵')
+    parser.add_argument('--arrays', default='', help='标定矩阵，不指定按阵营选择')
+    parser.add_argument('--mask', default='images/2025map_mask.png', help='高度层掩码')
+    parser.add_argument('--frames', type=int, default=0, help='测试帧数，0为整个视频')
+    parser.add_argument('--warmup', type=int, default=10, help='预热帧数，不计入统计')
+    parser.add_argument('--device-preprocess', type=int, default=0, help='在推理设备上做letterbox预处理')
+    parser.add_argument('--tracker', default='mean', choices=['mean', 'kalman'])
+    parser.add_argument('--lut-step', type=int, default=0, help='地图查找表采样步长，0为不使用查找表')
+    parser.add_argument('--car-tracking', type=int, default=0, help='跟踪机器人框，ID已确认的机器人沿用识别结果')
+    parser.add_argument('--keyframe', type=int, default=0, help='机器人检测只在关键帧上跑，中间帧用光流平移')
+    parser.add_argument('--field-roi', type=int, default=0, help='机器人检测只看场地区域')
+    parser.add_argument('--tiling', type=int, default=0, help='机器人检测分块推理')
+    parser.add_argument('--tile-size', type=int, default=0, help='块的边长（原图像素），0为模型输入尺寸')
+    parser.add_argument('--max-tiles', type=int, default=4, help='每帧最多推理的块数')
+    parser.add_argument('--out', default='', help='JSON结果保存路径，不指定则只打印')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    result = bench(opt)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if opt.out:
+        os.makedirs(os.path.dirname(opt.out) or '.', exist_ok=True)
+        with open(opt.out, 'w', encoding='utf-8') as f:
+            f.write(text)
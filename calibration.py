@@ -3,6 +3,8 @@ import time
 
 import cv2
 import numpy as np
+from frame_ring import FrameRing
+from map_projector import MapProjector, lut_path, field_path
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPixmap, QImage, QTextCursor
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QTextEdit, QGridLayout
@@ -13,7 +15,7 @@ import sys
 # 海康相机图像获取线程
 def hik_camera_get():
     # 获得设备信息
-    global camera_image
+    global frame_ring
     deviceList = MV_CC_DEVICE_INFO_LIST()
     tlayerType = MV_GIGE_DEVICE | MV_USB_DEVICE
 
@@ -97,38 +99,32 @@ def hik_camera_get():
     # 设置设备的一些参数
     set_Value(cam, param_type="float_value", node_name="ExposureTime", node_value=16000)  # 曝光时间
     set_Value(cam, param_type="float_value", node_name="Gain", node_value=17.9)  # 增益值
+    # 按相机画幅预分配帧环形缓冲区
+    frame_ring = FrameRing((get_Value(cam, param_type="int_value", node_name="Height"),
+                            get_Value(cam, param_type="int_value", node_name="Width"), 3), 3)
     # 开启设备取流
     start_grab_and_get_data_size(cam)
-    # 主动取流方式抓取图像
-    stParam = MVCC_INTVALUE_EX()
-
-    memset(byref(stParam), 0, sizeof(MVCC_INTVALUE_EX))
-    ret = cam.MV_CC_GetIntValueEx("PayloadSize", stParam)
-    if ret != 0:
-        print("get payload size fail! ret[0x%x]" % ret)
-        sys.exit()
-    nDataSize = stParam.nCurValue
-    pData = (c_ubyte * nDataSize)()
-    stFrameInfo = MV_FRAME_OUT_INFO_EX()
-
-    memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
-    while True:
-        ret = cam.MV_CC_GetOneFrameTimeout(pData, nDataSize, stFrameInfo, 1000)
-        if ret == 0:
-            image = np.asarray(pData)
-            # 处理海康相机的图像格式为OPENCV处理的格式
-            camera_image = image_control(data=image, stFrameInfo=stFrameInfo)
-        else:
-            print("no data[0x%x]" % ret)
+    # 主动取流方式抓取图像，直接转换为OPENCV格式写入环形缓冲区
+    ring_get_image(cam, frame_ring)
 
 
 def video_capture_get():
-    global camera_image
+    global frame_ring
     cam = cv2.VideoCapture(1)
-    while True:
+    ret, img = cam.read()
+    while not ret:
         ret, img = cam.read()
+    frame_ring = FrameRing(img.shape, 3)
+    frame_ring.write(img)
+    while True:
+        index, frame = frame_ring.writable()
+        if frame is None:
+            # 没有空闲槽位，丢弃该帧
+            cam.grab()
+            continue
+        ret, _ = cam.read(frame)  # 直接读到槽位中
         if ret:
-            camera_image = img
+            frame_ring.commit(index)
             time.sleep(0.016)  # 60fps
 
 
@@ -198,7 +194,7 @@ class MyUI(QWidget):
             right_image_path = "images/2025map_blue.png"  # 替换为右边图片的路径
 
         # _,left_image = self.camera_capture.read()
-        left_image = camera_image
+        self.frame_seq, index, left_image = frame_ring.acquire()
         right_image = cv2.imread(right_image_path)
 
         # 记录缩放比例
@@ -209,6 +205,7 @@ class MyUI(QWidget):
         self.right_scale_y = right_image.shape[0] / R_height
 
         left_image = cv2.cvtColor(left_image, cv2.COLOR_BGR2RGB)
+        frame_ring.release(index)
         self.left_image = cv2.resize(left_image, (L_width, L_height))
         right_image = cv2.cvtColor(right_image, cv2.COLOR_BGR2RGB)
         self.right_image = cv2.resize(right_image, (R_width, R_height))
@@ -268,8 +265,13 @@ class MyUI(QWidget):
 
     def update_camera(self):
         if self.capturing:
-            img0 = camera_image
+            # 只在有新帧时刷新，读取期间持有槽位
+            frame = frame_ring.acquire(self.frame_seq, timeout=0)
+            if frame is None:
+                return
+            self.frame_seq, index, img0 = frame
             left_image = cv2.cvtColor(img0, cv2.COLOR_BGR2RGB)
+            frame_ring.release(index)
             self.left_image = cv2.resize(left_image, (L_width, L_height))
             self.update_images()
 
@@ -338,6 +340,11 @@ class MyUI(QWidget):
             self.T.append(cv2.getPerspectiveTransform(image_point, map_point))
 
         np.save(self.save_path, self.T)
+        # 同时生成相机像素到地图坐标的查找表，主程序启动时直接内存映射
+        projector = MapProjector(self.T, cv2.imread("images/2025map_mask.png"))
+        projector.save_lut(lut_path(self.save_path, lut_step), frame_ring.shape, lut_step)
+        # 场地在画面中的区域，主程序的机器人检测只看这块区域
+        projector.save_field(field_path(self.save_path), frame_ring.shape)
 
         self.append_text('保存计算')
         print('保存计算', self.save_path)
@@ -366,15 +373,18 @@ class MyUI(QWidget):
 
 if __name__ == '__main__':
     camera_mode = 'hik'  # 'test':测试模式,'hik':海康相机,'video':USB相机（videocapture）
-    camera_image = None
+    frame_ring = None  # 帧环形缓冲区，由图像获取线程按画幅创建
     state = 'R'  # R:红方/B:蓝方
+    lut_step = 1  # 查找表采样步长，需与main.py的user_lut_step一致
 
     if camera_mode == 'test':
-        camera_image = cv2.imread('images/test_image.jpg')
+        test_image = cv2.imread('images/test_image.jpg')
+        frame_ring = FrameRing(test_image.shape, 2)
+        frame_ring.write(test_image)
     elif camera_mode in ['hik', 'hik_test']:
         # 海康相机图像获取线程
         from hik_camera import call_back_get_image, start_grab_and_get_data_size, close_and_destroy_device, set_Value, \
-            get_Value, image_control
+            get_Value, image_control, ring_get_image
 
         if sys.platform.startswith("win"):
             from MvImport.MvCameraControl_class import *
@@ -391,7 +401,7 @@ if __name__ == '__main__':
         thread_camera = threading.Thread(target=video_capture_get, daemon=True)
         thread_camera.start()
 
-    while camera_image is None:
+    while frame_ring is None or frame_ring.seq == 0:
         print("等待图像。。。")
         time.sleep(0.5)
     app = QApplication(sys.argv)
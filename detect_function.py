@@ -19,6 +19,7 @@ from utils.general import (LOGGER, check_img_size, scale_boxes)
 
 import random
 import torch
+import torch.nn.functional as F
 import numpy as np
 from utils.general import non_max_suppression, xyxy2xywh
 from utils.torch_utils import select_device
@@ -30,9 +31,14 @@ from utils.augmentations import letterbox
 class YOLOv5Detector:
     def __init__(self, weights_path, img_size=(640, 640), conf_thres=0.70, iou_thres=0.2, max_det=10,
                  device='', classes=None, agnostic_nms=False, augment=False, visualize=False, half=True, dnn=False,
-                 data='data/coco128.yaml', ui=False):
+                 data='data/coco128.yaml', ui=False, device_preprocess=False):
         # 设置设备
         self.ui = ui
+        # 在推理设备上做预处理（GPU上缩放/填充/归一化，CPU上复用预分配缓冲区）
+        self.device_preprocess = device_preprocess
+        self.input_buffer = None  # 预分配的模型输入(B, 3, H, W)
+        self.canvas = None  # CPU预处理用的letterbox画布
+        self.resized = None  # CPU预处理用的缩放结果
         self.device = select_device(device)
 
         # 加载模型
@@ -58,21 +64,25 @@ class YOLOv5Detector:
         self.model.warmup(imgsz=(1 if pt or self.model.triton else bs, 3, *self.img_size))  # warmup
 
     def predict(self, img):
-        # 对图片进行处理
-
-        im0 = img.copy()
-        im = letterbox(im0, self.img_size, self.model.stride, auto=self.model.pt)[0]
-        im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-        im = np.ascontiguousarray(im)
-
-        im = torch.from_numpy(im).to(self.device)
-        im = im.half() if self.half else im.float()
-        im /= 255
-        if len(im.shape) == 3:
-            im = im[None]  # expand for batch dim
-
-        # 预测
-        pred = self.model(im, augment=self.augment, visualize=self.visualize)
+        ratio_pad = None
+        if self.device_preprocess:
+            # .pt模型与letterbox(auto=True)一样只补齐到stride的整数倍
+            im = self.get_input_buffer(1, self.auto_shape(img) if self.model.pt else None)
+            ratio_pad = self.preprocess(img, im[0])
+        else:
+            # 对图片进行处理（letterbox本身会生成新图，无需再拷贝原图）
+            im = letterbox(img, self.img_size, stride=self.model.stride, auto=self.model.pt)[0]
+            im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+            im = np.ascontiguousarray(im)
+
+            im = torch.from_numpy(im).to(self.device)
+            im = im.half() if self.half else im.float()
+            im /= 255
+            if len(im.shape) == 3:
+                im = im[None]  # expand for batch dim
+
+        # 预测（静态batch的模型同样需要补齐）
+        pred = self.model(self.pad_batch(im), augment=self.augment, visualize=self.visualize)
 
         # NMS
         pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, self.classes, self.agnostic_nms,
@@ -81,27 +91,9 @@ class YOLOv5Detector:
         # 用于存放结果
         detections = []
 
-        # 处理预测结果
-        for i, det in enumerate(pred):
-            # gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
-            if len(det):
-
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
-                # print(det)
-                for *xyxy, conf, cls in reversed(det):
-                    xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4))).view(-1).tolist()
-                    xywh = [round(x) for x in xywh]
-                    xywh = [xywh[0] - xywh[2] // 2, xywh[1] - xywh[3] // 2, xywh[2], xywh[3]]
-                    if self.ui:
-                        annotator = Annotator(np.ascontiguousarray(img), line_width=3, example=str(self.names))
-                        # print(int(cls))
-                        label = f'{self.names[int(cls)]} {conf:.2f}'
-                        annotator.box_label(xyxy, label, color=self.colors[int(cls)])
-
-                    cls = self.names[int(cls)]
-                    conf = float(conf)
-                    line = (cls, xywh, conf)
-                    detections.append(line)
+        # 处理预测结果，补齐的图不取结果
+        for i, det in enumerate(pred[:1]):
+            detections.extend(self.process_det(det, im.shape[2:], img, ratio_pad))
         # if self.save_data:
         #     if time.time() - self.save_time >= 1:
         #         self.save_time = time.time()
@@ -115,6 +107,137 @@ class YOLOv5Detector:
 
         return detections
 
+    # 批量推理：所有ROI统一letterbox成一个batch，一次前向+一次NMS，返回每张图各自的检测结果列表
+    def predict_batch(self, imgs):
+        results = [[] for _ in imgs]
+        # 过滤掉空ROI（框贴边时可能裁出0宽/0高）
+        index = [i for i, img in enumerate(imgs) if img is not None and img.size]
+        if not index:
+            return results
+
+        # 固定尺寸letterbox（auto=False），保证所有ROI形状一致可以拼batch
+        ratio_pads = [None] * len(imgs)
+        if self.device_preprocess:
+            ims = self.get_input_buffer(len(index))
+            for j, i in enumerate(index):
+                ratio_pads[i] = self.preprocess(imgs[i], ims[j])
+        else:
+            ims = np.stack([letterbox(imgs[i], self.img_size, stride=self.model.stride, auto=False)[0] for i in index])
+            ims = ims.transpose((0, 3, 1, 2))[:, ::-1]  # BHWC to BCHW, BGR to RGB
+            ims = torch.from_numpy(np.ascontiguousarray(ims)).to(self.device)
+            ims = ims.half() if self.half else ims.float()
+            ims /= 255
+
+        # 按推理后端支持的batch上限分块，静态batch的模型需要补齐
+        max_bs = self.max_batch_size()[0] or len(index)
+        for s in range(0, len(index), max_bs):
+            n = min(max_bs, len(index) - s)
+            im = self.pad_batch(ims[s:s + max_bs])
+
+            # 预测
+            pred = self.model(im, augment=self.augment, visualize=self.visualize)
+
+            # NMS（本身就是按batch处理）
+            pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, self.classes, self.agnostic_nms,
+                                       max_det=self.max_det)
+
+            # 将每张图的结果映射回各自的ROI坐标
+            for j, det in enumerate(pred[:n]):
+                i = index[s + j]
+                results[i] = self.process_det(det, im.shape[2:], imgs[i], ratio_pads[i])
+        return results
+
+    # 推理后端允许的最大batch，以及该batch是否固定（静态导出的onnx/engine只能喂固定batch）
+    def max_batch_size(self):
+        model = self.model
+        if model.engine:
+            return model.batch_size, not model.dynamic
+        if model.onnx and not model.dnn:
+            bs = model.session.get_inputs()[0].shape[0]
+            return (bs, True) if isinstance(bs, int) else (None, False)
+        if model.pt or model.jit:
+            return None, False
+        return 1, True
+
+    # 静态batch的模型只能喂固定batch，不足的部分用填充色的空图补齐
+    def pad_batch(self, im):
+        max_bs, fixed = self.max_batch_size()
+        n = im.shape[0]
+        if fixed and n < max_bs:
+            im = torch.cat([im, im.new_full((max_bs - n, *im.shape[1:]), 114 / 255)])
+        return im
+
+    # 预分配的模型输入，batch不够或输入尺寸变化时重新分配，shape默认为img_size
+    def get_input_buffer(self, n, shape=None):
+        shape = tuple(shape or self.img_size)
+        if self.input_buffer is None or self.input_buffer.shape[0] < n or self.input_buffer.shape[2:] != shape:
+            dtype = torch.float16 if self.half else torch.float32
+            self.input_buffer = torch.empty((n, 3, *shape), dtype=dtype, device=self.device)
+        return self.input_buffer[:n]
+
+    # letterbox(auto=True)的输出尺寸：缩放后每边只补齐到stride的整数倍
+    def auto_shape(self, img):
+        h0, w0 = img.shape[:2]
+        r = min(self.img_size[0] / h0, self.img_size[1] / w0)
+        h, w = int(round(h0 * r)), int(round(w0 * r))
+        s = self.model.stride
+        return h + (self.img_size[0] - h) % s, w + (self.img_size[1] - w) % s
+
+    # 在推理设备上完成letterbox（缩放、填充、BGR转RGB、归一化），原始uint8图像只上传一次
+    # out为(3, H, W)的输入张量（img_size或auto_shape的尺寸），返回(ratio, pad)供scale_boxes使用
+    def preprocess(self, img, out):
+        h0, w0 = img.shape[:2]
+        new_h, new_w = out.shape[1:]
+        r = min(self.img_size[0] / h0, self.img_size[1] / w0)
+        w, h = int(round(w0 * r)), int(round(h0 * r))
+        dw, dh = (new_w - w) / 2, (new_h - h) / 2
+        top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+
+        if self.device.type == 'cpu':
+            # CPU：缩放到预分配缓冲区，再一次性完成通道翻转、转置和归一化
+            if self.canvas is None or self.canvas.shape[:2] != (new_h, new_w):
+                self.canvas = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            self.canvas.fill(114)
+            if (h, w) != (h0, w0):
+                if self.resized is None or self.resized.shape[:2] != (h, w):
+                    self.resized = np.empty((h, w, 3), dtype=np.uint8)
+                img = cv2.resize(img, (w, h), dst=self.resized, interpolation=cv2.INTER_LINEAR)
+            self.canvas[top:top + h, left:left + w] = img
+            np.divide(self.canvas.transpose((2, 0, 1))[::-1], 255, out=out.numpy(), casting='unsafe')
+        else:
+            # GPU：上传uint8原图，在显存中缩放和填充
+            im = torch.from_numpy(img).to(self.device, non_blocking=True)
+            im = im.permute(2, 0, 1).flip(0)[None].to(out.dtype)  # HWC to CHW, BGR to RGB
+            if (h, w) != (h0, w0):
+                im = F.interpolate(im, size=(h, w), mode='bilinear', align_corners=False)
+            out.fill_(114 / 255)
+            out[:, top:top + h, left:left + w] = im[0] / 255
+        return (r, r), (dw, dh)
+
+    # 将单张图的NMS结果缩放回原图，并转换为(cls, [left, top, w, h], conf)
+    def process_det(self, det, im_shape, img, ratio_pad=None):
+        detections = []
+        # gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
+        if len(det):
+
+            det[:, :4] = scale_boxes(im_shape, det[:, :4], img.shape, ratio_pad).round()
+            # print(det)
+            for *xyxy, conf, cls in reversed(det):
+                xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4))).view(-1).tolist()
+                xywh = [round(x) for x in xywh]
+                xywh = [xywh[0] - xywh[2] // 2, xywh[1] - xywh[3] // 2, xywh[2], xywh[3]]
+                if self.ui:
+                    annotator = Annotator(np.ascontiguousarray(img), line_width=3, example=str(self.names))
+                    # print(int(cls))
+                    label = f'{self.names[int(cls)]} {conf:.2f}'
+                    annotator.box_label(xyxy, label, color=self.colors[int(cls)])
+
+                cls = self.names[int(cls)]
+                conf = float(conf)
+                line = (cls, xywh, conf)
+                detections.append(line)
+        return detections
+
 
 if __name__ == "__main__":
     import cv2
@@ -0,0 +1,86 @@
+import ctypes
+import threading
+import time
+
+import numpy as np
+
+
+# 预分配的N槽位帧环形缓冲区
+# 采集线程直接把图像转换写入空闲槽位，读者按序列号获取最新帧并持有槽位，处理完再释放；
+# 所有槽位都被读者占用时采集线程跳过该帧，保证热路径上每帧只转换一次、不做拷贝
+class FrameRing:
+    def __init__(self, shape, slots=4, dtype=np.uint8, pin=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frames = []
+        self.memory = []  # 持有底层内存，避免被回收
+        nbytes = int(np.prod(self.shape)) * np.dtype(dtype).itemsize
+        for _ in range(slots):
+            if pin:
+                # 锁页内存，后续上传GPU可以走DMA
+                import torch
+                buffer = torch.empty(nbytes, dtype=torch.uint8).pin_memory()
+                frame = buffer.numpy().view(dtype).reshape(self.shape)
+            else:
+                buffer = (ctypes.c_ubyte * nbytes)()
+                frame = np.frombuffer(buffer, dtype=dtype).reshape(self.shape)
+            self.memory.append(buffer)
+            self.frames.append(frame)
+        self.seqs = [0] * slots  # 每个槽位中帧的序列号
+        self.stamps = [0.0] * slots  # 每个槽位中帧的提交时间
+        self.readers = [0] * slots  # 每个槽位当前被多少读者持有
+        self.writing = -1  # 正在写入的槽位
+        self.latest = -1  # 最新一帧所在槽位
+        self.seq = 0  # 最新一帧的序列号
+        self.skipped = 0  # 因没有空闲槽位被跳过的帧数
+        self.cond = threading.Condition()
+
+    # 写者获取一个空闲槽位，返回(槽位号, 图像视图)，没有空闲槽位返回(-1, None)
+    def writable(self):
+        with self.cond:
+            for i in range(1, self.slots + 1):
+                index = (self.latest + i) % self.slots
+                if self.readers[index] == 0 and index != self.latest:
+                    self.writing = index
+                    return index, self.frames[index]
+            self.skipped += 1
+            return -1, None
+
+    # 写者写完后提交，该槽位成为最新帧
+    def commit(self, index):
+        with self.cond:
+            self.seq += 1
+            self.seqs[index] = self.seq
+            self.stamps[index] = time.time()
+            self.latest = index
+            self.writing = -1
+            self.cond.notify_all()
+            return self.seq
+
+    # 写者放弃本次写入，槽位保持原来的帧，不产生新的序列号
+    def abort(self, index):
+        with self.cond:
+            if self.writing == index:
+                self.writing = -1
+
+    # 直接写入一张已有的图像（测试模式/USB相机等无法原地转换的来源）
+    def write(self, image):
+        index, frame = self.writable()
+        if frame is None:
+            return 0
+        np.copyto(frame, image)
+        return self.commit(index)
+
+    # 读者获取比last_seq更新的最新帧并持有该槽位，返回(序列号, 槽位号, 图像视图)，超时返回None
+    def acquire(self, last_seq=0, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > last_seq, timeout):
+                return None
+            index = self.latest
+            self.readers[index] += 1
+            return self.seqs[index], index, self.frames[index]
+
+    # 读者处理完毕，释放槽位
+    def release(self, index):
+        with self.cond:
+            self.readers[index] -= 1
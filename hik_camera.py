@@ -19,22 +19,25 @@ global img_test
 
 
 # 枚举设备
-def image_control(data, stFrameInfo):
+def image_control(data, stFrameInfo, dst=None):
+    # dst不为空时直接转换到预分配的图像中（统一转换为BGR三通道），避免每帧新建数组
     image = None
     if stFrameInfo.enPixelType == 17301505:
         image = data.reshape((stFrameInfo.nHeight, stFrameInfo.nWidth))
+        if dst is not None:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=dst)
         # image_show(image=image, name=stFrameInfo.nHeight)
     elif stFrameInfo.enPixelType == 17301513:
         data = data.reshape(stFrameInfo.nHeight, stFrameInfo.nWidth, -1)
-        image = cv2.cvtColor(data, cv2.COLOR_BAYER_RG2RGB)
+        image = cv2.cvtColor(data, cv2.COLOR_BAYER_RG2RGB, dst=dst)
         # image_show(image=image, name=stFrameInfo.nHeight)
     elif stFrameInfo.enPixelType == 35127316:
         data = data.reshape(stFrameInfo.nHeight, stFrameInfo.nWidth, -1)
-        image = cv2.cvtColor(data, cv2.COLOR_RGB2BGR)
+        image = cv2.cvtColor(data, cv2.COLOR_RGB2BGR, dst=dst)
         # image_show(image=image, name=stFrameInfo.nHeight)
     elif stFrameInfo.enPixelType == 34603039:
         data = data.reshape(stFrameInfo.nHeight, stFrameInfo.nWidth, -1)
-        image = cv2.cvtColor(data, cv2.COLOR_YUV2BGR_Y422)
+        image = cv2.cvtColor(data, cv2.COLOR_YUV2BGR_Y422, dst=dst)
         # image_show(image=image, name=stFrameInfo.nHeight)
     return image
 
@@ -517,6 +520,79 @@ def access_get_image(cam, active_way="getImagebuffer"):
                 print("no data[0x%x]" % ret)
 
 
+# 枚举设备（没有设备时一直等待），打开第nConnectionNum个相机
+def open_camera(nConnectionNum=0):
+    deviceList = MV_CC_DEVICE_INFO_LIST()
+    tlayerType = MV_GIGE_DEVICE | MV_USB_DEVICE
+    while 1:
+        ret = MvCamera.MV_CC_EnumDevices(tlayerType, deviceList)
+        if ret != 0:
+            print("enum devices fail! ret[0x%x]" % ret)
+        if deviceList.nDeviceNum == 0:
+            print("find no device!")
+        else:
+            print("Find %d devices!" % deviceList.nDeviceNum)
+            break
+    identify_different_devices(deviceList)
+    if int(nConnectionNum) >= deviceList.nDeviceNum:
+        print("intput error!")
+        sys.exit()
+
+    # 创建相机实例，选择设备并创建句柄
+    cam = MvCamera()
+    stDeviceList = cast(deviceList.pDeviceInfo[int(nConnectionNum)], POINTER(MV_CC_DEVICE_INFO)).contents
+    ret = cam.MV_CC_CreateHandle(stDeviceList)
+    if ret != 0:
+        print("create handle fail! ret[0x%x]" % ret)
+        sys.exit()
+    open_device(cam)
+    return cam
+
+
+# 主动取流写入帧环形缓冲区
+def ring_get_image(cam, frame_ring, on_frame=None, stop_event=None):
+    """
+    :param cam:         相机实例（需已开启取流）
+    :param frame_ring:  FrameRing 实例，形状为 (Height, Width, 3)
+    :param on_frame:    每提交一帧后的回调，无参数
+    :param stop_event:  threading.Event，置位后退出取流循环
+    :return:
+    """
+    stParam = MVCC_INTVALUE_EX()
+    memset(byref(stParam), 0, sizeof(MVCC_INTVALUE_EX))
+    ret = cam.MV_CC_GetIntValueEx("PayloadSize", stParam)
+    if ret != 0:
+        print("get payload size fail! ret[0x%x]" % ret)
+        sys.exit()
+    nDataSize = stParam.nCurValue
+    pData = (c_ubyte * nDataSize)()
+    data = np.frombuffer(pData, dtype=np.uint8)
+    stFrameInfo = MV_FRAME_OUT_INFO_EX()
+    memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
+    unsupported = set()  # 已提示过的不支持的像素格式
+    while stop_event is None or not stop_event.is_set():
+        ret = cam.MV_CC_GetOneFrameTimeout(pData, nDataSize, stFrameInfo, 1000)
+        if ret == 0:
+            index, frame = frame_ring.writable()
+            if frame is None:
+                # 所有槽位都被读者占用，跳过该帧
+                continue
+            # 每帧只做一次格式转换，直接写入槽位
+            image = image_control(data=data[:stFrameInfo.nFrameLen], stFrameInfo=stFrameInfo, dst=frame)
+            if image is None:
+                # 不支持的像素格式，槽位里还是旧图像，不能提交
+                frame_ring.abort(index)
+                if stFrameInfo.enPixelType not in unsupported:
+                    unsupported.add(stFrameInfo.enPixelType)
+                    print("unsupported pixel type[0x%x]" % stFrameInfo.enPixelType)
+                continue
+            frame_ring.commit(index)
+            if on_frame is not None:
+                on_frame()
+        else:
+            print("no data[0x%x]" % ret)
+
+
 # 回调取图采集
 if sys.platform.startswith("win"):
     winfun_ctype = WINFUNCTYPE
@@ -0,0 +1,118 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+
+# 关键帧检测：机器人检测模型只在关键帧上跑，中间帧用稀疏光流把上一帧的机器人框平移过去
+# 光流只在上一帧的框内取角点，缩小后的灰度图上计算，开销远小于一次检测
+# 框内跟踪成功的点太少（遮挡、转身、出画）时立即改跑检测；interval为0时按每帧时间预算自动调整关键帧间隔
+class KeyframeDetector:
+    def __init__(self, detector, interval=0, budget=1 / 30, max_interval=5, scale=0.25, max_points=20,
+                 min_points=4, min_ratio=0.5):
+        self.detector = detector
+        self.interval = interval  # 关键帧间隔，0为按预算自适应
+        self.budget = budget  # 每帧的时间预算（秒）
+        self.max_interval = max_interval
+        self.scale = scale  # 光流图像的缩放比例
+        self.max_points = max_points  # 每个框内最多取的角点数
+        self.min_points = min_points  # 每个框至少要跟踪成功的点数
+        self.min_ratio = min_ratio  # 每个框跟踪成功的点占比下限
+        self.gray = None  # 上一帧缩小后的灰度图
+        self.detections = []  # 上一帧的检测结果
+        self.since_keyframe = 0
+        self.detect_time = 0.0  # 检测耗时的滑动平均
+        self.flow_time = 0.0  # 光流耗时的滑动平均
+        self.keyframes = 0
+        self.propagated = 0
+        self.lost = 0  # 光流跟丢而提前检测的次数
+
+    @property
+    def ui(self):
+        return self.detector.ui
+
+    @property
+    def device(self):
+        return self.detector.device
+
+    # 当前的关键帧间隔：检测在预算内就每帧检测，否则取使(检测 + (N-1)*光流)/N不超过预算的最小N
+    def current_interval(self):
+        if self.interval > 0:
+            return self.interval
+        if self.detect_time <= self.budget:
+            return 1
+        if self.flow_time >= self.budget:
+            return self.max_interval
+        return min(self.max_interval, math.ceil((self.detect_time - self.flow_time) / (self.budget - self.flow_time)))
+
+    @staticmethod
+    def _average(old, new):
+        return new if old == 0 else old * 0.9 + new * 0.1
+
+    def _small_gray(self, img):
+        small = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_NEAREST)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    # 把上一帧的框按框内光流的中位数位移平移到当前帧并裁剪到图像内（同clip_boxes），有框跟丢或移出画面返回None
+    def _propagate(self, gray, shape):
+        if not self.detections:
+            return []
+        points = []
+        owners = []
+        h, w = gray.shape
+        for b, (cls, (left, top, bw, bh), conf) in enumerate(self.detections):
+            x0, y0 = max(int(left * self.scale), 0), max(int(top * self.scale), 0)
+            x1, y1 = min(int((left + bw) * self.scale) + 1, w), min(int((top + bh) * self.scale) + 1, h)
+            if x1 - x0 < 3 or y1 - y0 < 3:
+                return None
+            p = cv2.goodFeaturesToTrack(self.gray[y0:y1, x0:x1], self.max_points, 0.01, 2)
+            if p is None or len(p) < self.min_points:
+                return None
+            points.append(p.reshape(-1, 2) + (x0, y0))
+            owners.extend([b] * len(p))
+        points = np.concatenate(points).astype(np.float32)
+        owners = np.array(owners)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+        status = status.reshape(-1).astype(bool)
+        detections = []
+        for b, (cls, (left, top, bw, bh), conf) in enumerate(self.detections):
+            ok = status & (owners == b)
+            if ok.sum() < max(self.min_points, self.min_ratio * (owners == b).sum()):
+                return None
+            dx, dy = np.median(moved[ok] - points[ok], axis=0) / self.scale
+            x0, y0 = int(round(left + dx)), int(round(top + dy))
+            x1, y1 = min(x0 + bw, shape[1]), min(y0 + bh, shape[0])
+            x0, y0 = max(x0, 0), max(y0, 0)
+            if x1 <= x0 or y1 <= y0:
+                return None
+            detections.append((cls, [x0, y0, x1 - x0, y1 - y0], conf))
+        return detections
+
+    # 与YOLOv5Detector.predict相同的输出格式
+    def predict(self, img):
+        gray = self._small_gray(img)
+        detections = None
+        if self.gray is not None and self.since_keyframe < self.current_interval() - 1:
+            t = time.perf_counter()
+            detections = self._propagate(gray, img.shape)
+            self.flow_time = self._average(self.flow_time, time.perf_counter() - t)
+            if detections is None:
+                self.lost += 1
+        if detections is None:
+            t = time.perf_counter()
+            detections = self.detector.predict(img)
+            self.detect_time = self._average(self.detect_time, time.perf_counter() - t)
+            self.since_keyframe = 0
+            self.keyframes += 1
+        else:
+            self.since_keyframe += 1
+            self.propagated += 1
+        self.gray = gray
+        self.detections = [d for d in detections if d[0] == 'car']
+        return detections
+
+    def format_stats(self):
+        return 'keyframe N=%d detect %.1fms flow %.1fms key:%d prop:%d lost:%d' % (
+            self.current_interval(), self.detect_time * 1e3, self.flow_time * 1e3, self.keyframes, self.propagated,
+            self.lost)
@@ -0,0 +1,250 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+# 落点所在高度层
+LAYER_GROUND = 0  # 地面层、公路层
+LAYER_R = 1  # R型高地
+LAYER_RING = 2  # 环形高地
+
+
+# 多高度层透视变换：一次性把所有装甲板点投影到三层地图，再用掩码颜色向量化选择所在层
+class MapProjector:
+    def __init__(self, arrays, mask_image):
+        # arrays为标定保存的三个透视变换矩阵：地面层、R型高地、环形高地
+        self.M = np.asarray(arrays, dtype=np.float64)[:3]
+        self.M_xy = self.M[:, :, :2].reshape(9, 2).T  # 作用于x、y的部分
+        self.M_t = self.M[:, :, 2].reshape(9)  # 平移部分
+        self.mask_image = mask_image
+        # 确定地图画面像素，保证不会溢出
+        self.height = mask_image.shape[0] - 1
+        self.width = mask_image.shape[1] - 1
+        self.upper = np.array([self.width, self.height])
+        # 预先计算掩码每个像素属于哪一层：黑色为地面，绿色为R型高地，蓝色为环形高地
+        b = mask_image[..., 0].astype(np.int16)
+        g = mask_image[..., 1].astype(np.int16)
+        r = mask_image[..., 2].astype(np.int16)
+        self.is_ground = (b == 0) & (g == 0) & (r == 0)
+        self.is_r = (g > r) & (g > b)
+        self.is_ring = (b > r) & (b > g)
+
+    # 三个矩阵一次矩阵乘法完成投影，返回(3, N, 2)的地图坐标（已限制在地图范围内的整数）
+    def transform(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        # (N, 2) @ (2, 9) + (9,) -> (N, 3层, 3)
+        mapped = (points @ self.M_xy + self.M_t).reshape(-1, 3, 3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mapped = mapped[..., :2] / mapped[..., 2:]
+        mapped[~np.isfinite(mapped)] = 0
+        mapped = np.clip(mapped, 0, self.upper).astype(np.int32)  # 向零取整后限制在地图范围内
+        return mapped.transpose(1, 0, 2)
+
+    # 输入(N, 2)的相机像素点，返回(N, 2)的地图坐标和(N,)的所在层
+    # 先看地面层落点是否在地面，否则看R型高地，再看环形高地，都不满足按R型高地处理
+    def project(self, points):
+        mapped = self.transform(points)
+        ground, height_r, height_g = mapped
+        on_ground = self.is_ground[ground[:, 1], ground[:, 0]]
+        on_r = self.is_r[height_r[:, 1], height_r[:, 0]]
+        on_ring = self.is_ring[height_g[:, 1], height_g[:, 0]]
+
+        layers = np.where(on_ground, LAYER_GROUND, np.where(~on_r & on_ring, LAYER_RING, LAYER_R))
+        coords = np.where((layers == LAYER_GROUND)[:, None], ground,
+                          np.where((layers == LAYER_RING)[:, None], height_g, height_r))
+        return coords, layers
+
+    # 预计算相机像素到地图坐标的查找表，每隔step个像素取一个点，返回(H', W', 3)的int16：map_x, map_y, 层
+    def build_lut(self, image_shape, step=1, rows=64):
+        h, w = image_shape[:2]
+        ys = np.arange(0, h, step)
+        xs = np.arange(0, w, step)
+        lut = np.empty((len(ys), len(xs), 3), dtype=np.int16)
+        # 分块计算，限制内存占用
+        for i in range(0, len(ys), rows):
+            grid_x, grid_y = np.meshgrid(xs, ys[i:i + rows])
+            points = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+            coords, layers = self.project(points)
+            lut[i:i + rows, :, :2] = coords.reshape(-1, len(xs), 2)
+            lut[i:i + rows, :, 2] = layers.reshape(-1, len(xs))
+        return lut
+
+    # 生成查找表并保存为可内存映射的.npy
+    def save_lut(self, path, image_shape, step=1):
+        lut = self.build_lut(image_shape, step)
+        np.save(path, lut)
+        return lut
+
+    # 场地在相机画面中的区域：地图边界按三层透视变换的逆变换投到画面上取凸包，再向上扩展margin（画面高度的比例）
+    # 包住机器人车身；看台、天花板等不会出现机器人的区域不在其中。返回(N, 2)的int32多边形
+    def field_polygon(self, image_shape, margin=0.1, samples=50):
+        h, w = image_shape[:2]
+        mw, mh = self.width + 1, self.height + 1
+        t = np.linspace(0, 1, samples, endpoint=False)
+        border = np.concatenate([np.stack([t * mw, np.zeros_like(t)], 1),
+                                 np.stack([np.full_like(t, mw), t * mh], 1),
+                                 np.stack([mw - t * mw, np.full_like(t, mh)], 1),
+                                 np.stack([np.zeros_like(t), mh - t * mh], 1)])
+        border = np.concatenate([border, np.ones((len(border), 1))], axis=1)
+        points = []
+        for M in self.M:
+            # 透视变换矩阵只确定到相差一个比例，先统一符号使画面中心投影后的齐次坐标为正
+            if (M @ (w / 2, h / 2, 1))[2] < 0:
+                M = -M
+            mapped = border @ np.linalg.inv(M).T
+            # 落在相机背后的点没有意义
+            mapped = mapped[mapped[:, 2] > 1e-9]
+            points.append(mapped[:, :2] / mapped[:, 2:])
+        points = np.concatenate(points)
+        points = np.concatenate([points, points - (0, margin * h)])
+        points = np.clip(points, 0, (w - 1, h - 1)).astype(np.float32)
+        return cv2.convexHull(points).reshape(-1, 2).astype(np.int32)
+
+    # 生成场地区域并保存
+    def save_field(self, path, image_shape, margin=0.1):
+        polygon = self.field_polygon(image_shape, margin)
+        np.save(path, polygon)
+        return polygon
+
+
+# 查找表路径：与标定矩阵放在一起，文件名带上采样步长
+def lut_path(arrays_path, step=1):
+    return os.path.splitext(arrays_path)[0] + '_lut%d.npy' % step
+
+
+# 场地区域路径：与标定矩阵放在一起
+def field_path(arrays_path):
+    return os.path.splitext(arrays_path)[0] + '_field.npy'
+
+
+# 读取标定时保存的场地区域，不存在或比标定矩阵旧时按当前画幅重新生成
+def load_field(arrays_path, mask_path, image_shape, margin=0.1):
+    path = field_path(arrays_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(arrays_path):
+        polygon = np.load(path)
+        h, w = image_shape[:2]
+        if polygon[:, 0].max() < w and polygon[:, 1].max() < h:
+            return polygon
+    print('生成场地区域', path)
+    projector = MapProjector(np.load(arrays_path), cv2.imread(mask_path))
+    return projector.save_field(path, image_shape, margin)
+
+
+# 相机像素到地图坐标的查找表，接口与MapProjector.project一致，定位只需读取每个点所在格子的四个角点
+class MapLUT:
+    def __init__(self, lut, step=1, projector=None):
+        self.lut = lut
+        self.step = step
+        # 四个角点不在同一层的格子交给projector精确计算
+        self.projector = projector
+        self.upper = np.array([lut.shape[1] - 1, lut.shape[0] - 1])
+        self.cell_upper = np.maximum(self.upper - 1, 0)  # 格子左上角的最大索引
+        # 展平后一次索引取出格子的四个角点：左上、右上、左下、右下
+        self.flat = lut.reshape(-1, 3)
+        self.corners = np.array([0, 1, lut.shape[1], lut.shape[1] + 1]) if lut.shape[1] > 1 and lut.shape[0] > 1 \
+            else np.zeros(4, dtype=np.intp)
+
+    # 读取查找表，不存在、尺寸不符或比标定矩阵/掩码旧时重新生成
+    @classmethod
+    def load(cls, arrays_path, mask_path, image_shape, step=1):
+        path = lut_path(arrays_path, step)
+        projector = MapProjector(np.load(arrays_path), cv2.imread(mask_path))
+        h, w = image_shape[:2]
+        shape = (len(range(0, h, step)), len(range(0, w, step)), 3)
+        lut = None
+        if os.path.exists(path) and os.path.getmtime(path) >= max(os.path.getmtime(arrays_path),
+                                                                   os.path.getmtime(mask_path)):
+            lut = np.load(path, mmap_mode='r')
+            if lut.shape != shape:
+                lut = None
+        if lut is None:
+            print('生成地图查找表', path)
+            projector.save_lut(path, image_shape, step)
+            lut = np.load(path, mmap_mode='r')
+        return cls(lut, step, projector)
+
+    # 点向下取整找到所在格子，坐标按四个角点双线性插值，不对点和层边界做四舍五入
+    def project(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        grid = np.minimum(np.maximum(points * (1.0 / self.step), 0), self.upper)
+        cell = np.minimum(grid.astype(np.intp), self.cell_upper)  # 非负，截断即向下取整
+        frac = grid - cell
+        corners = self.flat[(cell[:, 1] * self.lut.shape[1] + cell[:, 0])[:, None] + self.corners]  # (N, 4, 3)
+        value = corners[..., :2]
+        fx, fy = frac[:, None, :1], frac[:, None, 1:]
+        top = value[:, 0:1] + (value[:, 1:2] - value[:, 0:1]) * fx
+        bottom = value[:, 2:3] + (value[:, 3:4] - value[:, 2:3]) * fx
+        coords = (top + (bottom - top) * fy)[:, 0].astype(np.int32)
+        layer = corners[..., 2]
+        layers = layer[:, 0].astype(np.int64)
+
+        # 跨层的格子插值没有意义，精确计算
+        mixed = (layer != layer[:, :1]).any(axis=1)
+        if self.projector is not None and mixed.any():
+            coords[mixed], layers[mixed] = self.projector.project(points[mixed])
+        return coords, layers
+
+
+# 原逐点分层判断（用于对比测试）
+def project_by_point(point, M_ground, M_height_r, M_height_g, mask_image):
+    height, width = mask_image.shape[0] - 1, mask_image.shape[1] - 1
+    camera_point = np.array([[point]], dtype=np.float32)
+    for M, layer in ((M_ground, LAYER_GROUND), (M_height_r, LAYER_R), (M_height_g, LAYER_RING)):
+        mapped_point = cv2.perspectiveTransform(camera_point, M)
+        x_c = min(max(int(mapped_point[0][0][0]), 0), width)
+        y_c = min(max(int(mapped_point[0][0][1]), 0), height)
+        color = mask_image[y_c, x_c]
+        if layer == LAYER_GROUND and color[0] == color[1] == color[2] == 0:
+            return (x_c, y_c), layer
+        if layer == LAYER_R and color[1] > color[2] and color[1] > color[0]:
+            return (x_c, y_c), layer
+        if layer == LAYER_RING and color[0] > color[2] and color[0] > color[1]:
+            return (x_c, y_c), layer
+    mapped_point = cv2.perspectiveTransform(camera_point, M_height_r)
+    x_c = min(max(int(mapped_point[0][0][0]), 0), width)
+    y_c = min(max(int(mapped_point[0][0][1]), 0), height)
+    return (x_c, y_c), LAYER_R
+
+
+if __name__ == "__main__":
+    # 对比测试：向量化投影 vs 逐点分层判断
+    arrays = np.load('arrays_test_red.npy')
+    mask_image = cv2.imread("images/2025map_mask.png")
+    projector = MapProjector(arrays, mask_image)
+    rng = np.random.default_rng(0)
+
+    for n in (1, 6, 14, 100):
+        points = rng.uniform((0, 0), (3072, 2048), size=(n, 2)).astype(np.float32)
+        repeat = max(2000 // n, 20)
+
+        ts = time.perf_counter()
+        for _ in range(repeat):
+            expected = [project_by_point(p, arrays[0], arrays[1], arrays[2], mask_image) for p in points]
+        t_point = (time.perf_counter() - ts) / repeat
+
+        ts = time.perf_counter()
+        for _ in range(repeat):
+            coords, layers = projector.project(points)
+        t_vector = (time.perf_counter() - ts) / repeat
+
+        same = sum(tuple(c) == e[0] and l == e[1] for c, l, e in zip(coords.tolist(), layers.tolist(), expected))
+        print(f'N={n:4d} 逐点 {t_point * 1e6:8.1f}us  向量化 {t_vector * 1e6:8.1f}us  '
+              f'加速 {t_point / t_vector:5.1f}x  结果一致 {same}/{n}')
+
+    # 查找表：构建耗时、查询耗时和与精确投影的误差
+    image_shape = (2048, 3072)
+    point_sets = rng.uniform((0, 0), (3072, 2048), size=(1000, 14, 2)).astype(np.float32)
+    exact = [projector.project(points) for points in point_sets]
+    for step in (1, 4, 8):
+        ts = time.perf_counter()
+        lut = MapLUT(projector.build_lut(image_shape, step), step, projector)
+        t_build = time.perf_counter() - ts
+        ts = time.perf_counter()
+        results = [lut.project(points) for points in point_sets]
+        t_lut = (time.perf_counter() - ts) / len(point_sets)
+        # 层分界处像素取整可能换层，误差取99分位
+        error = np.percentile(np.concatenate([np.abs(r[0] - e[0]).max(axis=1) for r, e in zip(results, exact)]), 99)
+        same = sum((r[1] == e[1]).sum() for r, e in zip(results, exact))
+        print(f'查找表 step={step}  构建 {t_build:5.2f}s  {lut.lut.nbytes / 2 ** 20:6.1f}MB  '
+              f'N=14 查询 {t_lut * 1e6:6.1f}us  p99误差 {error:.0f}px  层一致 {same}/{point_sets[..., 0].size}')
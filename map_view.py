@@ -0,0 +1,45 @@
+import cv2
+
+
+# 小地图显示：底图只在初始化时缩放一次，每帧先把上一帧画过标记的区域用底图还原，再画本帧的标记
+# 绘制开销只和机器人数量有关，和地图分辨率无关；坐标和字号按原图尺寸给出，内部按比例缩放
+class MapView:
+    def __init__(self, map_image, size=(600, 320)):
+        self.size = tuple(size)  # 显示尺寸 (宽, 高)
+        self.scale_x = self.size[0] / map_image.shape[1]
+        self.scale_y = self.size[1] / map_image.shape[0]
+        self.scale = min(self.scale_x, self.scale_y)  # 半径、字号、线宽的缩放比例
+        self.base = cv2.resize(map_image, self.size, interpolation=cv2.INTER_AREA)
+        self.canvas = self.base.copy()
+        self.dirty = []  # 上一帧画过的区域 (x0, y0, x1, y1)
+
+    def _to_view(self, x, y):
+        return int(x * self.scale_x), int(y * self.scale_y)
+
+    # 记录画过的区域，裁剪到画布内
+    def _mark(self, x0, y0, x1, y1):
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.size[0]), min(y1, self.size[1])
+        if x0 < x1 and y0 < y1:
+            self.dirty.append((x0, y0, x1, y1))
+
+    def circle(self, center, radius, color):
+        x, y = self._to_view(*center)
+        r = max(int(round(radius * self.scale)), 1)
+        cv2.circle(self.canvas, (x, y), r, color, -1)
+        self._mark(x - r - 1, y - r - 1, x + r + 2, y + r + 2)
+
+    def text(self, text, org, font_scale, color, thickness):
+        x, y = self._to_view(*org)
+        font_scale = font_scale * self.scale
+        thickness = max(int(round(thickness * self.scale)), 1)
+        cv2.putText(self.canvas, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness)
+        (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        self._mark(x - thickness, y - h - thickness, x + w + thickness + 1, y + baseline + thickness + 1)
+
+    # 开始新的一帧：还原上一帧画过的区域
+    def clear(self):
+        for x0, y0, x1, y1 in self.dirty:
+            self.canvas[y0:y1, x0:x1] = self.base[y0:y1, x0:x1]
+        self.dirty = []
+        return self.canvas
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+
+
+# 有界队列：队列满时丢弃最旧的一帧，慢的下游永远不会阻塞上游
+class DropQueue:
+    def __init__(self, maxsize=1, on_drop=None):
+        self.queue = deque(maxlen=maxsize)
+        self.on_drop = on_drop  # 丢弃数据时的回调（如释放帧缓冲槽位）
+        self.cond = threading.Condition()
+        self.put_count = 0  # 累计放入数量
+        self.dropped = 0  # 因队列满被丢弃的数量
+        self.closed = False
+
+    def put(self, item):
+        old = None
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                old = self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(item)
+            self.put_count += 1
+            self.cond.notify()
+        if old is not None and self.on_drop is not None:
+            self.on_drop(old)
+
+    # 取出最旧的一项，超时或队列关闭返回None
+    def get(self, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.queue or self.closed, timeout)
+            if self.queue:
+                return self.queue.popleft()
+            return None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+# 流水线中的一级：独立线程从输入队列取数据，处理后放入输出队列
+class Stage(threading.Thread):
+    def __init__(self, name, func, in_queue, out_queue, on_drop=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.on_drop = on_drop
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.running = False
+        self.count = 0  # 已处理数量
+        self.busy_time = 0.0  # 累计处理耗时（秒）
+        self.last_time = 0.0  # 最近一次处理耗时（秒）
+
+    def run(self):
+        self.running = True
+        while self.running:
+            item = self.in_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            t = time.perf_counter()
+            try:
+                out = self.func(item)
+            except Exception as r:
+                print('%s 处理失败 %s' % (self.name, r))
+                out = None
+            if out is None:
+                if self.on_drop is not None:
+                    self.on_drop(item)
+                continue
+            self.last_time = time.perf_counter() - t
+            self.busy_time += self.last_time
+            self.count += 1
+            self.out_queue.put(out)
+
+    def stop(self):
+        self.running = False
+
+
+# 多级流水线：采集 -> 各处理级 -> 输出，级间为丢旧帧的有界队列
+class Pipeline:
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop  # 任意一级丢弃数据时的回调
+        self.source = DropQueue(maxsize, on_drop)  # 采集线程把图像放到这里
+        self.output = self.source  # 最后一级的输出队列，由主线程（UI/录像）消费
+        self.stages = []
+        self.start_time = None
+
+    def add_stage(self, name, func):
+        stage = Stage(name, func, self.output, DropQueue(self.maxsize, self.on_drop), self.on_drop)
+        self.stages.append(stage)
+        self.output = stage.out_queue
+        return stage
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+        self.source.close()
+        for stage in self.stages:
+            stage.out_queue.close()
+
+    # 各级吞吐量统计：fps为启动以来的平均处理帧率，dropped为该级输出被下游丢弃的数量
+    def stats(self):
+        elapsed = max(time.perf_counter() - (self.start_time or time.perf_counter()), 1e-6)
+        stats = [{'name': 'capture', 'count': self.source.put_count,
+                  'fps': self.source.put_count / elapsed, 'busy_ms': 0.0,
+                  'dropped': self.source.dropped}]
+        for stage in self.stages:
+            stats.append({'name': stage.name, 'count': stage.count,
+                          'fps': stage.count / elapsed,
+                          'busy_ms': stage.busy_time / max(stage.count, 1) * 1000,
+                          'dropped': stage.out_queue.dropped})
+        return stats
+
+    def format_stats(self):
+        return ' | '.join('%s %.1ffps %.1fms drop:%d' % (s['name'], s['fps'], s['busy_ms'], s['dropped'])
+                          for s in self.stats())
@@ -0,0 +1,767 @@
+import threading
+import time
+import datetime
+import os
+
+import cv2
+import numpy as np
+
+from information_ui import draw_information_ui
+from detect_function import YOLOv5Detector
+from pipeline import Pipeline
+from frame_ring import FrameRing
+from map_projector import MapProjector, MapLUT, load_field
+from map_view import MapView
+from keyframe import KeyframeDetector
+from tiling import TiledDetector
+from tracker import Filter, KalmanTracker, CarTracker
+from video_recorder import VideoRecorder
+from RM_serial_py.ser_api import Radar_decision, build_data_decision, radar_all_values, PACKET_LAYOUTS, \
+    mapping_table
+from RM_serial_py.transport import SerialTransport
+from RM_serial_py.recorder import SerialRecorder
+from RM_serial_py.scheduler import UplinkScheduler, PRIORITY_URGENT
+
+image_exts = ['.jpg', '.jpeg', '.png', '.bmp']
+video_exts = ['.mp4', '.avi', '.mov', '.mkv']
+
+# 盲区预测点位，如果没有定位模块，连接数服务器的非哨兵机器人坐标为（0,0）
+guess_table = {
+    "R1": [(1000, 400), (960, 1000), (1123, 1195), (800, 1225), (946, 1341), (457, 1232)],
+    "R2": [(200, 100), (900, 900), (900, 600), (1335, 821), (1469, 687)],
+    "R3": [(998, 1059), (1186, 1266), (1663, 246)],
+    "R4": [(998, 1059), (1186, 1266), (1663, 246)],
+    "R7": [(386, 812), (1356, 1093), (1179, 858)],
+
+    "B1": [(1821, 1092), (1851, 513), (1754, 403), (2050, 347), (1800, 200)],
+    "B2": [(2600, 1400), (1900, 636), (1900, 878), (1500, 750), (1410, 654)],
+    "B3": [(1814, 475), (784, 1372), (1646, 270)],
+    "B4": [(1814, 475), (784, 1372), (1646, 270)],
+    "B7": [(1979, 652)],
+}
+# 参与盲区预测的机器人
+guess_names = ('B1', 'B2', 'B3', 'B4', 'B7', 'R1', 'R2', 'R3', 'R4', 'R7')
+
+
+# 雷达运行配置，对应原main.py开头的user_*变量
+class RadarConfig:
+    def __init__(self, state='R', camera_mode='test', usart=True, com='COM7',
+                 map_path='images/2025map.png', img_test='images/test_image.jpg',
+                 exposure_time=20000, gain=16, save_img=True, video_fps=10, video_codec='XVID', game_dir='test',
+                 weights_path='models/car.engine', weights_path_next='models/armor.engine',
+                 car_data='yaml/car.yaml', armor_data='yaml/armor.yaml', car_img_size=640, armor_img_size=640,
+                 arrays_path=None,
+                 mask_path='images/2025map_mask.png', ui=True, headless=False, display_fps=10, queue_size=1, show_stats=True, ring_slots=10, device_preprocess=False,
+                 map_lut=False, lut_step=1, tracker='mean', car_tracking=False, armor_refresh=10,
+                 armor_min_confidence=0.6, car_keyframe=False, car_interval=0, frame_budget=1 / 30,
+                 max_car_interval=5, field_roi=False, field_margin=0.1, car_tiling=False, tile_size=0,
+                 tile_overlap=0.25, max_tiles=4, radar_rate=5, interaction_rate=10,
+                 serial_log=False, send_latency=0.1):
+        self.state = state  # R:红方/B:蓝方
+        self.camera_mode = camera_mode  # 'test':测试模式,'hik':海康相机,'video':USB相机（videocapture）
+        self.usart = usart  # 是否连接裁判系统串口
+        self.com = com
+        self.map_path = map_path
+        self.img_test = img_test  # 测试模式的图片或视频
+        self.exposure_time = exposure_time
+        self.gain = gain
+        self.save_img = save_img  # 录像
+        self.video_fps = video_fps  # 录像帧率，与检测帧率无关，多余的帧抽掉
+        self.video_codec = video_codec  # 录像编码器（fourcc），如'XVID'、'MJPG'
+        self.game_dir = game_dir  # 录像和串口日志保存在save_video/game_dir下
+        self.weights_path = weights_path  # 机器人检测模型
+        self.weights_path_next = weights_path_next  # 装甲板检测模型
+        self.car_data = car_data  # 机器人检测模型的类别文件
+        self.armor_data = armor_data  # 装甲板检测模型的类别文件
+        self.car_img_size = car_img_size  # 机器人检测模型输入尺寸
+        self.armor_img_size = armor_img_size  # 装甲板检测模型输入尺寸，机器人ROI通常只有一百多像素，用tune_size.py选择
+        # 标定好的仿射变换矩阵，不指定按阵营选择
+        if arrays_path is None:
+            arrays_path = 'arrays_test_red.npy' if state == 'R' else 'arrays_test_blue.npy'
+        self.arrays_path = arrays_path
+        self.mask_path = mask_path  # 落点判断掩码
+        self.ui = ui  # 检测器绘制检测框
+        self.headless = headless  # 无界面运行：不绘制、不显示，检测器不画框，只录原始画面
+        self.display_fps = display_fps  # 界面刷新频率上限，主线程按该频率绘制，0为每帧都刷新
+        self.queue_size = queue_size  # 流水线级间队列长度，满了丢弃最旧的帧
+        self.show_stats = show_stats  # 定时打印流水线各级吞吐量
+        self.ring_slots = ring_slots  # 帧环形缓冲区槽位数，需大于流水线中同时在处理的帧数
+        self.device_preprocess = device_preprocess  # 在推理设备上做letterbox预处理，GPU上图像帧使用锁页内存
+        self.map_lut = map_lut  # 使用预计算的相机像素->地图坐标查找表定位
+        self.lut_step = lut_step  # 查找表采样步长
+        self.tracker = tracker  # 坐标滤波方式 'mean': 滑动窗口均值, 'kalman': 匀速模型卡尔曼
+        self.car_tracking = car_tracking  # 跟踪机器人框，ID已确认的机器人沿用识别结果，不再每帧跑装甲板模型
+        self.armor_refresh = armor_refresh  # 已确认ID的机器人每隔多少帧重新识别一次装甲板
+        self.armor_min_confidence = armor_min_confidence  # ID投票置信度低于该值时每帧都识别
+        self.car_keyframe = car_keyframe  # 机器人检测只在关键帧上跑，中间帧用光流平移机器人框
+        self.car_interval = car_interval  # 关键帧间隔，0为按每帧时间预算自适应
+        self.frame_budget = frame_budget  # 机器人检测级每帧的时间预算（秒）
+        self.max_car_interval = max_car_interval  # 自适应时关键帧间隔的上限
+        self.field_roi = field_roi  # 机器人检测只看标定时保存的场地区域的外接矩形，不看看台和天花板
+        self.field_margin = field_margin  # 场地区域向上扩展的比例（画面高度），包住机器人车身
+        self.car_tiling = car_tiling  # 机器人检测在原分辨率的重叠分块上推理，只推理有运动或有目标的块
+        self.tile_size = tile_size  # 块的边长（原图像素），0为机器人检测模型的输入尺寸，块内按原分辨率推理
+        self.tile_overlap = tile_overlap  # 相邻块的重叠比例
+        self.max_tiles = max_tiles  # 每帧最多推理的块数（另加一张整幅画面）
+        self.radar_rate = radar_rate  # 雷达坐标0x0305发送频率（Hz）
+        self.interaction_rate = interaction_rate  # 机器人交互0x0301发送频率上限（Hz）
+        self.serial_log = serial_log  # 记录串口收发的原始数据
+        self.send_latency = send_latency  # 发送时的延迟补偿（秒）
+
+
+# 裁判系统相关的共享状态，串口收发线程和UI线程共同读写，修改时加锁
+class RefereeState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.double_vulnerability_chance = -1  # 双倍易伤机会数
+        self.opponent_double_vulnerability = -1  # 是否正在触发双倍易伤
+        self.target = -1  # 飞镖当前瞄准目标（用于触发双倍易伤）
+        self.chances_flag = 1  # 双倍易伤触发标志位，需要从1递增，每小局比赛会重置，所以每局比赛要重启程序
+        self.progress_list = [-1, -1, -1, -1, -1, -1]  # 标记进度列表
+        self.guess_value = {name: 0 for name in guess_names}  # 上次盲区预测时的标记进度
+        self.guess_value_now = {name: 0 for name in guess_names}  # 当前标记进度（用于判断是否预测正确正确）
+        self.target_event = threading.Event()  # 飞镖目标切换事件
+
+
+def get_low_order_bit_list(received_data):
+    # 提取字节的整数值
+    if isinstance(received_data, bytes):
+        byte_value = received_data[0]
+    else:
+        byte_value = received_data  # 假设已经是整数
+
+    # 生成低位在前的位列表
+    bit_list = [(byte_value >> i) & 1 for i in range(8)]
+    bit_list.insert(4, 0)
+    bit_list = [x * 120 for x in bit_list]
+    for _ in range(3):
+        bit_list.pop()
+
+    return bit_list
+
+
+# 雷达主流程：图像获取 -> 机器人检测 -> 装甲板检测 -> 地图映射/滤波 -> UI/录像，以及裁判系统串口收发
+# start()启动相机、串口和流水线线程，run()在主线程显示；step(frame)同步处理单帧，用于离线测试和无界面运行
+class RadarPipeline:
+    def __init__(self, config):
+        self.config = config
+        self.state = config.state
+        self.camera_mode = config.camera_mode
+        self.referee = RefereeState()
+        # 初始化盲区预测列表
+        self.guess_list = {name: True for name in mapping_table}
+
+        # 导入战场每个高度的不同仿射变化矩阵（地面层、R型高地、环形高地），按掩码颜色选择落点所在层
+        self.map_projector = MapProjector(np.load(config.arrays_path), cv2.imread(config.mask_path))
+
+        # 初始化战场信息UI（标记进度、双倍易伤次数、双倍易伤触发状态）
+        self.information_ui = np.zeros((500, 420, 3), dtype=np.uint8) * 255
+        # 加载战场地图，显示用的小地图只缩放一次
+        self.map_backup = cv2.imread(config.map_path)
+        self.map_view = MapView(self.map_backup, (600, 320)) if not config.headless else None
+
+        # 创建机器人坐标滤波器，输出坐标限制在地图范围内
+        bounds = (self.map_backup.shape[1], self.map_backup.shape[0])
+        if config.tracker == 'kalman':
+            self.filter = KalmanTracker(max_inactive_time=2, guess_list=self.guess_list, names=tuple(mapping_table),
+                                        bounds=bounds)
+        else:
+            self.filter = Filter(window_size=3, max_inactive_time=2, guess_list=self.guess_list,
+                                 names=tuple(mapping_table), bounds=bounds)
+
+        # 机器人框跟踪，决定哪些机器人需要跑装甲板模型
+        self.car_tracker = CarTracker(refresh=config.armor_refresh, min_confidence=config.armor_min_confidence) \
+            if config.car_tracking else None
+
+        # 加载模型，实例化机器人检测器和装甲板检测器，无界面时不画检测框（也省去每帧拷贝一份原图）
+        ui = config.ui and not config.headless
+        self.detector = YOLOv5Detector(config.weights_path, img_size=(config.car_img_size, config.car_img_size),
+                                       data=config.car_data, conf_thres=0.1, iou_thres=0.5, max_det=14, ui=ui,
+                                       device_preprocess=config.device_preprocess)
+        self.detector_next = YOLOv5Detector(config.weights_path_next,
+                                            img_size=(config.armor_img_size, config.armor_img_size),
+                                            data=config.armor_data, conf_thres=0.4, iou_thres=0.2, max_det=1, ui=ui,
+                                            device_preprocess=config.device_preprocess)
+        # 分块模式下远处的机器人在原分辨率的块上检测，和缩小的整幅画面一起推理
+        self.tiled_detector = TiledDetector(self.detector, config.tile_size, config.tile_overlap,
+                                            config.max_tiles) if config.car_tiling else None
+        car_detector = self.tiled_detector or self.detector
+        # 关键帧模式下中间帧的机器人框由光流传播
+        self.car_detector = KeyframeDetector(car_detector, config.car_interval, config.frame_budget,
+                                             config.max_car_interval) if config.car_keyframe else car_detector
+        # 图像直接从锁页内存上传到GPU
+        self.pin_memory = bool(config.device_preprocess) and self.detector.device.type != 'cpu'
+
+        # 检测流水线：采集 -> 机器人检测 -> 装甲板检测 -> 地图映射 -> UI/录像（主线程），级间队列满时丢弃最旧帧
+        self.pipeline = Pipeline(maxsize=config.queue_size, on_drop=self.release_frame)
+        self.pipeline.add_stage('car', self.car_stage)
+        self.pipeline.add_stage('armor', self.armor_stage)
+        self.pipeline.add_stage('map', self.map_stage)
+
+        self.frame_ring = None  # 帧环形缓冲区，由图像获取线程按画幅创建
+        self.field_rect = None  # 机器人检测区域 (x0, y0, x1, y1)，为None检测整幅画面
+        self.ser = None
+        self.serial_recorder = None
+        self.serial_transport = None  # 串口接收，由接收线程创建
+        self.uplink = None  # 串口发送调度器，由发送线程创建
+        self.video_writer_map = None
+        self.video_writer_raw = None
+        self.video_writer_ui = None
+        self.display_count = 0  # 已显示帧数
+        self.display_busy = 0.0  # 累计绘制和显示耗时（秒）
+        self.threads = []
+        self.stop_event = threading.Event()
+
+    # 最新帧从环形缓冲区取出（持有槽位）后送入流水线
+    def feed_pipeline(self):
+        frame = self.frame_ring.acquire()
+        if frame is not None:
+            seq, index, raw = frame
+            self.pipeline.source.put(self.new_item(raw, self.frame_ring.stamps[index], frame))
+
+    # 流水线丢弃或处理完一帧后释放其槽位
+    def release_frame(self, item):
+        if item['frame'] is not None:
+            self.frame_ring.release(item['frame'][1])
+
+    # 一帧的处理数据，frame为环形缓冲区中的(序列号, 槽位号, 图像)，不来自环形缓冲区时为None
+    def new_item(self, raw, t, frame=None):
+        # 只有需要绘制检测框时才拷贝一份，避免检测框画进原始帧
+        img0 = raw.copy() if self.car_detector.ui or self.detector_next.ui else raw
+        return {'frame': frame, 'raw': raw, 'img': img0, 'time': t}
+
+    # 流水线第一级：机器人检测，原始帧用于裁剪和录像
+    def car_stage(self, item):
+        img = item['img']
+        x0 = y0 = 0
+        if self.field_rect is not None:
+            # 只把场地区域送进模型，同样的输入尺寸下有效分辨率更高
+            x0, y0, x1, y1 = self.field_rect
+            img = img[y0:y1, x0:x1]
+            if self.car_detector.ui:
+                img = np.ascontiguousarray(img)
+        # 第一层神经网络识别
+        result0 = self.car_detector.predict(img)
+        if self.field_rect is not None and self.car_detector.ui:
+            # 叠加检测结果到原图的对应位置
+            item['img'][y0:y0 + img.shape[0], x0:x0 + img.shape[1]] = img
+        car_boxes = []
+        car_crops = []
+        for detection in result0:
+            cls, xywh, conf = detection
+            if cls == 'car':
+                left, top, w, h = xywh
+                left, top, w, h = int(left) + x0, int(top) + y0, int(w), int(h)
+                # 存储第一次检测结果和区域
+                # ROI出机器人区域
+                cropped = item['raw'][top:top + h, left:left + w]
+                car_boxes.append((left, top, w, h))
+                car_crops.append(np.ascontiguousarray(cropped))
+        item['car_boxes'] = car_boxes
+        item['car_crops'] = car_crops
+        return item
+
+    # 流水线第二级：装甲板检测，输出每个装甲板在原图中待仿射变化的点
+    def armor_stage(self, item):
+        img0 = item['img']
+        # 获取相机图像的画幅，限制点不超限
+        img_y, img_x = item['raw'].shape[:2]
+        armor_points = []
+        tracks = [None] * len(item['car_boxes'])
+        infer = list(range(len(item['car_boxes'])))
+        if self.car_tracker is not None:
+            # 机器人框关联到轨迹，ID已确认的轨迹沿用投票结果和装甲板在框内的相对位置，不再跑装甲板模型
+            tracks = self.car_tracker.update(item['car_boxes'])
+            infer = self.car_tracker.select(tracks)
+            for i in set(range(len(tracks))) - set(infer):
+                x, y = tracks[i].armor_point()
+                armor_points.append((tracks[i].identity()[0], min(x, img_x), min(y, img_y)))
+        # 第二层神经网络识别，需要识别的机器人ROI合成一个batch一次推理
+        if infer:
+            results_n = self.detector_next.predict_batch([item['car_crops'][i] for i in infer])
+            for i, result_n in zip(infer, results_n):
+                left, top, w, h = item['car_boxes'][i]
+                cropped_img = item['car_crops'][i]
+                if result_n:
+                    # 叠加第二次检测结果到原图的对应位置（绘制了检测框时）
+                    if self.detector_next.ui:
+                        img0[top:top + h, left:left + w] = cropped_img
+
+                    for detection1 in result_n:
+                        cls, xywh, conf = detection1
+                        if cls:  # 所有装甲板都处理，可选择屏蔽一些:
+                            x, y, w, h = xywh
+                            x = x + left
+                            y = y + top
+                            # 原图中装甲板的中心下沿作为待仿射变化的点
+                            point = (min(x + 0.5 * w, img_x), min(y + 1.5 * h, img_y))
+                            armor_points.append((cls, *point))
+                            if tracks[i] is not None:
+                                self.car_tracker.vote(tracks[i], cls, conf, point)
+        item['armor_points'] = armor_points
+        return item
+
+    # 流水线第三级：透视变换到地图坐标并滤波
+    def map_stage(self, item):
+        if item['armor_points']:
+            # 所有装甲板点一次性完成分层透视变换
+            names = [point[0] for point in item['armor_points']]
+            camera_points = np.array([point[1:] for point in item['armor_points']], dtype=np.float32)
+            map_points, layers = self.map_projector.project(camera_points)
+            self.filter.add_batch(names, map_points[:, 0], map_points[:, 1], t=item['time'])
+
+        # 获取所有识别到的机器人坐标
+        item['all_filter_data'] = self.filter.get_all_data()
+        return item
+
+    # 查找表与标定矩阵放在一起，不存在或过期时按当前画幅重新生成
+    def load_map_lut(self, shape):
+        self.map_projector = MapLUT.load(self.config.arrays_path, self.config.mask_path, shape, self.config.lut_step)
+
+    # 场地区域的外接矩形作为机器人检测区域
+    def load_field(self, shape):
+        polygon = load_field(self.config.arrays_path, self.config.mask_path, shape, self.config.field_margin)
+        x, y, w, h = cv2.boundingRect(polygon)
+        self.field_rect = (x, y, x + w, y + h)
+        print('机器人检测区域', self.field_rect)
+
+    # 同步处理一帧图像（不经过环形缓冲区和流水线线程），返回该帧的处理结果
+    def step(self, frame, t=None):
+        item = self.new_item(frame, time.time() if t is None else t)
+        return self.map_stage(self.armor_stage(self.car_stage(item)))
+
+    # 海康相机图像获取线程
+    def hik_camera_get(self):
+        import hik_camera
+        cam = hik_camera.open_camera(0)
+        print(hik_camera.get_Value(cam, param_type="float_value", node_name="ExposureTime"),
+              hik_camera.get_Value(cam, param_type="float_value", node_name="Gain"),
+              hik_camera.get_Value(cam, param_type="enum_value", node_name="TriggerMode"),
+              hik_camera.get_Value(cam, param_type="float_value", node_name="AcquisitionFrameRate"))
+
+        # 设置设备的一些参数
+        hik_camera.set_Value(cam, param_type="float_value", node_name="ExposureTime",
+                             node_value=self.config.exposure_time)  # 曝光时间
+        hik_camera.set_Value(cam, param_type="float_value", node_name="Gain", node_value=self.config.gain)  # 增益值
+        # 按相机画幅预分配帧环形缓冲区
+        self.frame_ring = FrameRing((hik_camera.get_Value(cam, param_type="int_value", node_name="Height"),
+                                     hik_camera.get_Value(cam, param_type="int_value", node_name="Width"), 3),
+                                    self.config.ring_slots, pin=self.pin_memory)
+        # 开启设备取流
+        hik_camera.start_grab_and_get_data_size(cam)
+        # 主动取流方式抓取图像，直接转换为OPENCV格式写入环形缓冲区
+        hik_camera.ring_get_image(cam, self.frame_ring, on_frame=self.feed_pipeline, stop_event=self.stop_event)
+        hik_camera.close_and_destroy_device(cam)
+
+    # USB相机图像获取线程
+    def video_capture_get(self):
+        cam = cv2.VideoCapture(1)
+        ret, img = cam.read()
+        while not ret:
+            ret, img = cam.read()
+        self.frame_ring = FrameRing(img.shape, self.config.ring_slots, pin=self.pin_memory)
+        while not self.stop_event.is_set():
+            index, frame = self.frame_ring.writable()
+            if frame is None:
+                # 没有空闲槽位，丢弃该帧
+                cam.grab()
+                continue
+            ret, _ = cam.read(frame)  # 直接读到槽位中
+            if ret:
+                self.frame_ring.commit(index)
+                self.feed_pipeline()
+                time.sleep(0.016)  # 60fps
+        cam.release()
+
+    # 测试模式的图像获取线程，按视频帧率送帧，模拟相机
+    def test_capture_get(self, video, test_image):
+        if video is not None:
+            frame_time = 1 / (video.get(cv2.CAP_PROP_FPS) or 30)
+        else:
+            frame_time = 1 / 30
+        while not self.stop_event.is_set():
+            t = time.time()
+            index, frame = self.frame_ring.writable()
+            if frame is None:
+                # 没有空闲槽位，丢弃该帧
+                if video is not None:
+                    video.grab()
+            else:
+                if video is not None:
+                    ret, _ = video.read(frame)  # 直接读到槽位中
+                    if not ret:
+                        time.sleep(0.5)
+                        continue
+                else:
+                    np.copyto(frame, test_image)
+                self.frame_ring.commit(index)
+                self.feed_pipeline()
+            time.sleep(max(frame_time - (time.time() - t), 0))
+
+    # 串口发送线程
+    def ser_send(self):
+        state = self.state
+        referee = self.referee
+        guess_list = self.guess_list
+        # 单点预测时间
+        guess_time = {name: 0 for name in guess_names}
+        # 预测点索引
+        guess_index = {name: 0 for name in guess_names}
+
+        # 发送蓝方机器人坐标
+        def send_point_B(send_name, all_filter_data):
+            # 转换为地图坐标系
+            filtered_xyz = (2800 - all_filter_data[send_name][1], all_filter_data[send_name][0])
+            # 转换为裁判系统单位M
+            ser_x = int(filtered_xyz[0]) * 10 / 10
+            ser_y = int(1500 - filtered_xyz[1]) * 10 / 10
+            return ser_x, ser_y
+
+        # 发送红发机器人坐标
+        def send_point_R(send_name, all_filter_data):
+            # 转换为地图坐标系
+            filtered_xyz = (all_filter_data[send_name][1], 1500 - all_filter_data[send_name][0])
+            # 转换为裁判系统单位M
+            ser_x = int(filtered_xyz[0]) * 10 / 10
+            ser_y = int(1500 - filtered_xyz[1]) * 10 / 10
+            return ser_x, ser_y
+
+        # 发送盲区预测点坐标
+        def send_point_guess(send_name, guess_time_limit):
+            guess_value_now = referee.guess_value_now
+            guess_value = referee.guess_value
+            # 进度未满 and 预测进度没有涨 and 超过单点预测时间上限，同时满足则切换另一个点预测
+            if guess_value_now.get(send_name) < 120 and guess_value_now.get(send_name) - guess_value.get(
+                    send_name) <= 0 and time.time() - guess_time.get(send_name) >= guess_time_limit:
+                points = guess_table.get(send_name)
+                if points:  # 确保存在坐标点
+                    guess_index[send_name] = (guess_index[send_name] + 1) % len(points)
+                guess_time[send_name] = time.time()
+            if guess_value_now.get(send_name) - guess_value.get(send_name) > 0:
+                guess_time[send_name] = time.time()
+            return guess_table.get(send_name)[guess_index.get(send_name)][0], \
+                guess_table.get(send_name)[guess_index.get(send_name)][1]
+
+        time_s = time.monotonic()
+        target_last = 0  # 上一帧的飞镖目标
+        update_time = 0  # 上次预测点更新时间
+        send_map = {name: (0, 0) for name in mapping_table}
+        # 敌方机器人，第一个为己方视角的发送函数
+        enemy = 'B' if state == 'R' else 'R'
+        send_point = send_point_B if state == 'R' else send_point_R
+
+        # 雷达坐标数据，每个发送周期由发送调度器调用一次
+        def radar_data():
+            nonlocal update_time
+            guess_time_limit = 3 + 1.7  # 单位：秒，根据上一帧的信道占用数动态调整单点预测时间
+            all_filter_data = self.filter.get_all_data(latency=self.config.send_latency)
+            for number in '12345':
+                name = enemy + number
+                if not guess_list.get(name):
+                    if all_filter_data.get(name, False):
+                        send_map[name] = send_point(name, all_filter_data)
+                elif number == '5':
+                    send_map[name] = (0, 0)
+                else:
+                    send_map[name] = send_point_guess(name, guess_time_limit)
+            # 哨兵
+            name = enemy + '7'
+            if guess_list.get(name):
+                send_map[name] = send_point_guess(name, guess_time_limit)
+            # 未识别到哨兵，进行盲区预测
+            elif all_filter_data.get(name, False):
+                send_map[name] = send_point(name, all_filter_data)
+
+            # 只返回坐标值，由调度器直接pack进预分配的0x0305数据包
+            ser_data = radar_all_values(send_map, state)
+
+            # 超过单点预测时间上限，更新上次预测的进度
+            if time.time() - update_time > guess_time_limit:
+                update_time = time.time()
+                with referee.lock:
+                    for number in '12347':
+                        referee.guess_value[enemy + number] = referee.guess_value_now.get(enemy + number)
+            return ser_data
+
+        # 发送调度器独占串口写，按裁判系统各命令码的频率上限限速，周期截止时间不受打包耗时影响
+        self.uplink = UplinkScheduler(self.ser, recorder=self.serial_recorder)
+        self.uplink.add_channel([0x03, 0x05], rate=self.config.radar_rate)
+        self.uplink.add_channel([0x03, 0x01], rate=self.config.interaction_rate)
+        self.uplink.periodic([0x03, 0x05], 1.0 / self.config.radar_rate, radar_data,
+                             layout=PACKET_LAYOUTS['radar_all'])
+        self.uplink.start()
+
+        while not self.stop_event.is_set():
+            # 飞镖目标更新时立即唤醒
+            referee.target_event.wait(timeout=1)
+            referee.target_event.clear()
+            try:
+                with referee.lock:
+                    target = referee.target
+                    chances = referee.double_vulnerability_chance
+                    triggering = referee.opponent_double_vulnerability
+                # 判断飞镖的目标是否切换，切换则尝试发动双倍易伤
+                if target != target_last and target != 0:
+                    target_last = target
+                    # 有双倍易伤机会，并且当前没有在双倍易伤
+                    if chances > 0 and triggering == 0:
+                        time_e = time.monotonic()
+                        # 发送时间间隔为10秒
+                        if time_e - time_s > 10:
+                            print("请求双倍触发")
+                            data = build_data_decision(referee.chances_flag, state)
+                            # 双倍易伤请求优先于周期坐标发送
+                            self.uplink.submit([0x03, 0x01], data, PRIORITY_URGENT)
+                            print("请求成功", referee.chances_flag)
+                            # 更新标志位
+                            with referee.lock:
+                                referee.chances_flag += 1
+                                if referee.chances_flag >= 3:
+                                    referee.chances_flag = 1
+
+                            time_s = time.monotonic()
+            except Exception as r:
+                print('未知错误 %s' % (r))
+
+    # 裁判系统串口接收线程
+    def ser_receive(self):
+        referee = self.referee
+        progress_cmd_id = [0x02, 0x0C]  # 任意想要接收数据的命令码，这里是雷达标记进度的命令码0x020C
+        vulnerability_cmd_id = [0x02, 0x0E]  # 双倍易伤次数和触发状态
+        target_cmd_id = [0x01, 0x05]  # 飞镖目标
+        enemy = 'B' if self.state == 'R' else 'R'
+
+        # 更新裁判系统数据，标记进度、易伤、飞镖目标
+        def on_progress(data, seq):
+            progress_list = get_low_order_bit_list(data)
+            with referee.lock:
+                referee.progress_list = progress_list
+                for i, number in ((0, '1'), (1, '2'), (2, '3'), (3, '4'), (5, '7')):
+                    referee.guess_value_now[enemy + number] = progress_list[i]
+
+        def on_vulnerability(data, seq):
+            chances, triggering = Radar_decision(data[0])
+            with referee.lock:
+                referee.double_vulnerability_chance = chances  # 拥有双倍易伤次数
+                referee.opponent_double_vulnerability = triggering  # 双倍易伤触发状态
+
+        def on_target(data, seq):
+            target_new = (data[1] & 0b11000000) >> 6
+            with referee.lock:
+                changed = target_new != referee.target
+                referee.target = target_new  # 飞镖当前目标
+            if changed:
+                referee.target_event.set()  # 唤醒发送线程判断是否请求双倍易伤
+
+        # 串口有数据时立即读取，按帧头长度切帧，每帧只解析一次，按命令码分发
+        self.serial_transport = SerialTransport(self.ser, recorder=self.serial_recorder)
+        self.serial_transport.register(progress_cmd_id, on_progress)
+        self.serial_transport.register(vulnerability_cmd_id, on_vulnerability)
+        self.serial_transport.register(target_cmd_id, on_target)
+        self.serial_transport.run()
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return thread
+
+    # 打开串口和相机，启动串口收发线程、图像获取线程和检测流水线
+    def start(self):
+        config = self.config
+        save_dir = "save_video/" + config.game_dir
+        if config.usart:
+            import serial
+            self.ser = serial.Serial(config.com, 115200, timeout=1)  # 串口，替换 'COM1' 为你的串口号
+            if config.serial_log:
+                self.serial_recorder = SerialRecorder(save_dir + "/serial/")
+            # 串口接收线程
+            self._start_thread(self.ser_receive)
+            # 串口发送线程
+            self._start_thread(self.ser_send)
+
+        video = None
+        test_image = None
+        if self.camera_mode == 'test':
+            test_type = os.path.splitext(config.img_test)[1].lower()
+            if test_type in image_exts:
+                test_image = cv2.imread(config.img_test)
+            elif test_type in video_exts:
+                video = cv2.VideoCapture(config.img_test)
+                ret, test_image = video.read()
+            self.frame_ring = FrameRing(test_image.shape, config.ring_slots, pin=self.pin_memory)
+        elif self.camera_mode in ['hik', 'hik_test']:
+            # 海康相机图像获取线程
+            self._start_thread(self.hik_camera_get)
+        elif self.camera_mode == 'video':
+            # USB相机图像获取线程
+            self._start_thread(self.video_capture_get)
+
+        while self.frame_ring is None:
+            print("等待图像。。。")
+            time.sleep(0.5)
+        print(self.frame_ring.shape)
+
+        if config.map_lut:
+            self.load_map_lut(self.frame_ring.shape)
+        if config.field_roi:
+            self.load_field(self.frame_ring.shape)
+
+        if config.save_img:
+            # 录视频
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            fourcc = config.video_codec
+            fps = config.video_fps
+            # 创建目录
+            video_dir_raw = save_dir + "/raw/"
+            os.makedirs(video_dir_raw, exist_ok=True)
+            # 每路录像一个编码进程，检测和显示线程只做缩放拷贝
+            self.video_writer_raw = VideoRecorder(os.path.join(video_dir_raw, f"screen_{timestamp}.avi"),
+                                                  (1300, 900), fps, fourcc, name='raw')
+            # 无界面时没有地图和检测框画面，只录原始画面
+            if not config.headless:
+                video_dir_map = save_dir + "/map/"
+                video_dir_ui = save_dir + "/ui/"
+                os.makedirs(video_dir_map, exist_ok=True)
+                os.makedirs(video_dir_ui, exist_ok=True)
+                self.video_writer_map = VideoRecorder(os.path.join(video_dir_map, f"map_{timestamp}.avi"),
+                                                      (600, 320), fps, fourcc, name='map')
+                self.video_writer_ui = VideoRecorder(os.path.join(video_dir_ui, f"screen_{timestamp}.avi"),
+                                                     (1300, 900), fps, fourcc, name='ui')
+
+        self.pipeline.start()
+        if self.camera_mode == 'test':
+            self._start_thread(self.test_capture_get, video, test_image)
+
+    # 主线程：绘制地图、UI、显示和录像
+    def render(self, item):
+        state = self.state
+        referee = self.referee
+        # 串口接收线程会同时写入，加锁取一份快照再绘制
+        with referee.lock:
+            progress_list = list(referee.progress_list)
+            vulnerability_chance = referee.double_vulnerability_chance
+            vulnerability_triggering = referee.opponent_double_vulnerability
+        # 刷新裁判系统信息UI图像
+        information_ui_show = self.information_ui.copy()
+        map = self.map_view
+        map.clear()
+        img0 = item['img']
+
+        all_filter_data = item['all_filter_data']
+        if all_filter_data != {}:
+            for name, xyxy in all_filter_data.items():
+                if xyxy is not None:
+                    if name[0] == "R":
+                        color_m = (0, 0, 255)
+                    else:
+                        color_m = (255, 0, 0)
+
+                    if self.camera_mode == 'hik_test':
+                        if state == 'R':
+                            filtered_xyz = (2800 - xyxy[1], xyxy[0] - 1000)
+                    elif state == 'R':
+                        filtered_xyz = (2800 - xyxy[1], xyxy[0])  # 缩放坐标到地图图像
+                    else:
+                        filtered_xyz = (xyxy[1], 1500 - xyxy[0])  # 缩放坐标到地图图像
+                    # 只绘制敌方阵营的机器人（这里不会绘制盲区预测的机器人）
+                    if name[0] != state:
+                        map.circle((int(filtered_xyz[0]), int(filtered_xyz[1])), 15, color_m)  # 绘制圆
+                        map.text(str(name), (int(filtered_xyz[0]) - 5, int(filtered_xyz[1]) + 5), 2.5,
+                                 (255, 255, 255), 5)
+                        if self.camera_mode == 'hik_test':
+                            ser_x = int(filtered_xyz[0])
+                            ser_y = int(500 - filtered_xyz[1])
+                        else:
+                            ser_x = int(filtered_xyz[0]) * 10 / 10
+                            ser_y = int(1500 - filtered_xyz[1]) * 10 / 10
+                        map.text("(" + str(ser_x) + "," + str(ser_y) + ")",
+                                 (int(filtered_xyz[0]) - 100, int(filtered_xyz[1]) + 60), 1.5, (255, 255, 255), 4)
+
+        # 绘制UI
+        _ = draw_information_ui(progress_list, state, information_ui_show)
+        cv2.putText(information_ui_show, "vulnerability_chances: " + str(vulnerability_chance),
+                    (10, 350),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(information_ui_show, "vulnerability_Triggering: " + str(vulnerability_triggering),
+                    (10, 400),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.imshow('information_ui', information_ui_show)
+        map_show = map.canvas
+        cv2.imshow('map', map_show)
+        img0 = cv2.resize(img0, (1300, 900))
+        cv2.imshow('img', img0)
+
+        if self.video_writer_map is not None:
+            self.video_writer_map.write(map_show)
+            self.video_writer_ui.write(img0)
+
+    def format_stats(self):
+        lines = [self.pipeline.format_stats()]
+        if self.serial_transport is not None:
+            lines.append(self.serial_transport.format_stats())
+        if self.uplink is not None:
+            lines.append(self.uplink.format_stats())
+        if self.car_tracker is not None:
+            lines.append(self.car_tracker.format_stats())
+        if self.tiled_detector is not None:
+            lines.append(self.tiled_detector.format_stats())
+        if self.config.car_keyframe:
+            lines.append(self.car_detector.format_stats())
+        writers = [writer.format_stats() for writer in (self.video_writer_raw, self.video_writer_map,
+                                                        self.video_writer_ui) if writer is not None]
+        if writers:
+            lines.append('video ' + ' | '.join(writers))
+        return '\n'.join(lines)
+
+    # 主线程循环：取流水线输出录原始画面，按display_fps绘制和显示最新帧，直到stop
+    def run(self):
+        stats_time = time.time()
+        display_time = 0
+        display_interval = 1.0 / self.config.display_fps if self.config.display_fps > 0 else 0.0
+        # 有界面时没有新帧也要定时处理窗口事件
+        timeout = 1 if self.config.headless else 0.05
+        while not self.stop_event.is_set():
+            item = self.pipeline.output.get(timeout=timeout)
+            if item is not None:
+                if self.video_writer_raw is not None:
+                    # 按录像帧率抽帧，缩放直接写进共享内存
+                    self.video_writer_raw.write(item['raw'])
+                now = time.time()
+                if not self.config.headless and now - display_time >= display_interval:
+                    display_time = now
+                    t = time.perf_counter()
+                    self.render(item)
+                    self.display_busy += time.perf_counter() - t
+                    self.display_count += 1
+                self.release_frame(item)
+            if not self.config.headless:
+                cv2.waitKey(1)
+
+            # 定时打印流水线各级吞吐量
+            if self.config.show_stats and time.time() - stats_time > 5:
+                stats_time = time.time()
+                print(self.format_stats())
+                if not self.config.headless:
+                    print('display %d帧 %.1fms/帧' % (self.display_count,
+                                                     self.display_busy * 1000 / max(self.display_count, 1)))
+        if not self.config.headless:
+            cv2.destroyAllWindows()
+
+    # 停止所有线程，关闭串口日志和录像
+    def stop(self):
+        self.stop_event.set()
+        self.pipeline.stop()
+        if self.serial_transport is not None:
+            self.serial_transport.stop()
+        if self.uplink is not None:
+            self.uplink.stop()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        if self.serial_recorder is not None:
+            self.serial_recorder.close()
+        for writer in (self.video_writer_map, self.video_writer_raw, self.video_writer_ui):
+            if writer is not None:
+                writer.release()
+        if self.ser is not None:
+            self.ser.close()
@@ -0,0 +1,41 @@
+import numpy as np
+
+from keyframe import KeyframeDetector
+
+
+# 只在关键帧被调用的假检测器，返回固定的机器人框
+class FakeDetector:
+    def __init__(self, box):
+        self.box = box
+        self.ui = False
+        self.calls = 0
+
+    def predict(self, img):
+        self.calls += 1
+        return [('car', list(self.box), 0.9)]
+
+
+TEXTURE = np.kron(np.random.default_rng(0).integers(0, 255, (150, 200), dtype=np.uint8),
+                  np.ones((4, 4), dtype=np.uint8))
+
+
+# 整幅纹理平移后的画面，纹理上(100, 100)处的内容出现在画面的(x, y)
+def frame(x, y):
+    img = TEXTURE[100 - y:580 - y, 100 - x:740 - x]
+    return np.repeat(img[..., None], 3, axis=2)
+
+
+# 框随光流移向画面左上角时裁剪到图像内，不出现负坐标
+def test_propagated_box_is_clipped_to_image():
+    detector = FakeDetector((24, 30, 120, 120))
+    keyframe = KeyframeDetector(detector, interval=10, scale=0.5, max_points=50)
+    keyframe.predict(frame(24, 30))
+    (cls, box, conf), = keyframe.predict(frame(14, 20))
+    assert abs(box[0] - 14) <= 2 and abs(box[1] - 20) <= 2 and box[2:] == [120, 120]
+    for x, y in ((4, 10), (-6, 0), (-16, -10)):
+        (cls, box, conf), = keyframe.predict(frame(x, y))
+        left, top, w, h = box
+        assert left >= 0 and top >= 0
+        assert left + w <= 640 and top + h <= 480
+    assert detector.calls == 1
+    assert left == 0 and top == 0 and w < 120 and h < 120
@@ -0,0 +1,39 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from map_projector import MapProjector, MapLUT
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_SHAPE = (2048, 3072)
+
+
+@pytest.fixture(scope='module')
+def projector():
+    arrays = np.load(os.path.join(ROOT, 'arrays_test_red.npy'))
+    mask = cv2.imread(os.path.join(ROOT, 'images', '2025map_mask.png'))
+    return MapProjector(arrays, mask)
+
+
+# 随机的亚像素点，查找表结果与精确投影比较
+@pytest.mark.parametrize('step', [1, 4])
+def test_lut_matches_projector(projector, step):
+    lut = MapLUT(projector.build_lut(IMAGE_SHAPE, step), step, projector)
+    points = np.random.default_rng(0).uniform((0, 0), (IMAGE_SHAPE[1], IMAGE_SHAPE[0]), size=(14000, 2))
+    exact_coords, exact_layers = projector.project(points)
+    coords, layers = lut.project(points)
+    error = np.abs(coords - exact_coords).max(axis=1)
+    assert np.percentile(error, 99) <= 2
+    assert (layers == exact_layers).mean() >= 0.999
+
+
+# 图像边界上的点（含右下角）不越界
+def test_lut_image_border(projector):
+    lut = MapLUT(projector.build_lut(IMAGE_SHAPE, 1), 1, projector)
+    h, w = IMAGE_SHAPE
+    points = np.array([[0, 0], [w - 1, h - 1], [w - 0.5, h - 0.5], [-3, 5], [w + 10, h + 10]], dtype=np.float64)
+    coords, layers = lut.project(points)
+    assert coords.shape == (5, 2) and layers.shape == (5,)
+    assert (coords >= 0).all() and (coords <= projector.upper).all()
@@ -0,0 +1,63 @@
+import numpy as np
+import torch
+
+from tiling import TiledDetector
+
+
+# 按输入尺寸letterbox的假检测器，记录每个块送进模型时的缩放比例；红色方块视为机器人
+class FakeDetector:
+    def __init__(self, img_size=(640, 640)):
+        self.img_size = list(img_size)
+        self.ui = False
+        self.device = torch.device('cpu')
+        self.names = {0: 'car'}
+        self.colors = [[0, 255, 0]]
+        self.scales = []  # 每次predict_batch中每张图的缩放比例
+        self.visible = True  # 为False时什么也检测不到
+
+    def predict_batch(self, imgs):
+        self.scales.append([min(self.img_size[0] / img.shape[0], self.img_size[1] / img.shape[1]) for img in imgs])
+        results = []
+        for img in imgs:
+            ys, xs = np.nonzero((img[..., 2] == 255) & (img[..., 1] == 0))
+            if self.visible and len(xs):
+                results.append([('car', [int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1),
+                                         int(ys.max() - ys.min() + 1)], 0.9)])
+            else:
+                results.append([])
+        return results
+
+
+def frame(x=1000, y=800):
+    img = np.zeros((1650, 3072, 3), dtype=np.uint8)
+    img[y:y + 16, x:x + 20] = (0, 0, 255)
+    return img
+
+
+# 默认块尺寸等于模型输入尺寸，块送进模型时不缩放
+def test_tile_reaches_model_at_full_resolution():
+    detector = FakeDetector((640, 640))
+    tiled = TiledDetector(detector, max_tiles=4)
+    detections = tiled.predict(frame())
+    assert tiled.tile_size == (640, 640)
+    assert all(x1 - x0 == 640 and y1 - y0 == 640 for x0, y0, x1, y1 in tiled.tiles)
+    full, *tiles = detector.scales[0]
+    assert full < 0.25
+    assert tiles and all(abs(scale - 1.0) < 1e-6 for scale in tiles)
+    assert [box for _, box, _ in detections] == [[1000, 800, 20, 16]]
+
+
+# 没推理的块里沿用的框连续refresh帧没有新的检出就丢弃
+def test_carried_detections_expire():
+    detector = FakeDetector((640, 640))
+    tiled = TiledDetector(detector, max_tiles=1, full_frame=False, refresh=5)
+    img = frame(100, 100)
+    assert tiled.predict(img)
+    # 推理名额被其他块占满时目标所在的块一直不推理，只能沿用
+    tiled.max_tiles = 0
+    carried = 0
+    while tiled.predict(img):
+        carried += 1
+        assert carried < 10
+    assert carried == tiled.refresh - 1
+    assert tiled.expired == 1
@@ -0,0 +1,33 @@
+import time
+
+from RM_serial_py.ser_api import RADAR_ALL_STRUCT
+from tracker import Filter, KalmanTracker
+
+
+# 贴着地图边缘快速移动的机器人，按延迟补偿外推后仍在地图内，可以打包成无符号坐标
+def test_kalman_extrapolation_stays_on_map():
+    tracker = KalmanTracker(names=('B1',), bounds=(1500, 2800), max_predict_time=1.0)
+    t = time.time() - 0.3
+    for k in range(4):
+        tracker.add_data('B1', 40 - 10 * k, 2760 + 10 * k, t=t + 0.1 * k)
+    x, y = tracker.get_all_data(latency=0.5)['B1']
+    assert x == 0 and y == 2800
+    RADAR_ALL_STRUCT.pack(*[int(v) for v in (x, y)] * 6)
+
+
+def test_kalman_without_bounds_is_unclipped():
+    tracker = KalmanTracker(names=('B1',), max_predict_time=1.0)
+    t = time.time() - 0.3
+    for k in range(4):
+        tracker.add_data('B1', 40 - 10 * k, 100, t=t + 0.1 * k)
+    x, y = tracker.get_all_data(latency=0.5)['B1']
+    assert x < 0
+
+
+# 投影到场外的观测取均值后同样限制在地图内
+def test_filter_mean_stays_on_map():
+    tracker = Filter(window_size=3, names=('R3',), bounds=(1500, 2800))
+    for x, y in ((-20, 2790), (-30, 2850), (-10, 2900)):
+        tracker.add_data('R3', x, y)
+    x, y = tracker.get_all_data()['R3']
+    assert x == 0 and y == 2800
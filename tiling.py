@@ -0,0 +1,204 @@
+import math
+import time
+
+import cv2
+import numpy as np
+from utils.plots import Annotator
+
+
+# 分块检测：把画面切成互相重叠的块，块的尺寸等于模型输入尺寸，块内不缩放，按原分辨率推理；和整幅画面一起组成一个batch
+# 帧差能量低于阈值且上一帧没有检测结果的块直接跳过，每帧最多跑max_tiles个块，推理开销有上限
+# 机器人可能被块边界截断，合并时完整的框优先于贴着块内侧边界的框，再按置信度做跨块NMS
+# 块数超过上限没推理的块沿用上一帧的框，连续沿用refresh帧没有被重新检出就丢弃
+class TiledDetector:
+    def __init__(self, detector, tile_size=0, overlap=0.25, max_tiles=4, full_frame=True, refresh=30,
+                 motion_scale=0.125, diff_thres=15, motion_thres=0.002, iou_thres=0.5, ios_thres=0.8):
+        self.detector = detector
+        # 检测框由分块检测在合并后统一画，内层检测器不在块的拷贝上画
+        self.ui = detector.ui
+        detector.ui = False
+        self.colors = {detector.names[i]: color for i, color in enumerate(detector.colors)}
+        # 块的尺寸 (宽, 高)（原图像素），0为模型输入尺寸
+        self.tile_size = (tile_size, tile_size) if tile_size > 0 else (detector.img_size[1], detector.img_size[0])
+        self.overlap = overlap  # 相邻块的重叠比例，需大于远处机器人的尺寸
+        self.max_tiles = max_tiles  # 每帧最多推理的块数
+        self.full_frame = full_frame  # 同时推理整幅画面，负责被块截断的近处大目标
+        self.refresh = refresh  # 块超过多少帧没推理就强制推理一次，防止静止目标被漏掉
+        self.motion_scale = motion_scale  # 帧差图像的缩放比例
+        self.diff_thres = diff_thres  # 灰度差超过该值的像素视为运动
+        self.motion_thres = motion_thres  # 运动像素占比超过该值的块视为有运动
+        self.iou_thres = iou_thres
+        self.ios_thres = ios_thres  # 交集占较小框面积的比例，超过视为同一目标被截断的部分
+        self.shape = None  # 当前分块对应的图像尺寸
+        self.tiles = []  # 每个块 (x0, y0, x1, y1)
+        self.last_run = None  # 每个块上次推理的帧号
+        self.gray = None  # 上一帧缩小后的灰度图
+        self.detections = []  # 上一帧的检测结果
+        self.ages = []  # 上一帧每个检测结果已连续沿用的帧数，0为本帧检出
+        self.frame = 0
+        self.tile_count = 0  # 累计推理的块数
+        self.moving = 0  # 累计有运动的块数
+        self.tracked = 0  # 累计有上一帧目标的块数
+        self.infer_time = 0.0  # 推理耗时的滑动平均
+        self.carried = 0  # 累计沿用的检测结果数
+        self.expired = 0  # 累计沿用超时丢弃的检测结果数
+
+    @property
+    def device(self):
+        return self.detector.device
+
+    # 一个方向上均匀分布的块起点，块数为满足重叠要求的最小值
+    def _starts(self, length, size):
+        size = min(size, length)
+        if size == length:
+            return [0], size
+        step = size * (1 - self.overlap)
+        n = math.ceil((length - size) / step) + 1
+        return [int(round(i * (length - size) / (n - 1))) for i in range(n)], size
+
+    def _make_tiles(self, shape):
+        h, w = shape[:2]
+        xs, tw = self._starts(w, self.tile_size[0])
+        ys, th = self._starts(h, self.tile_size[1])
+        self.shape = shape[:2]
+        self.tiles = [(x, y, x + tw, y + th) for y in ys for x in xs]
+        self.last_run = np.full(len(self.tiles), -self.refresh, dtype=np.int64)
+        self.gray = None
+        self.detections = []
+        self.ages = []
+
+    # 每个块的运动像素占比，没有上一帧时视为全部有运动
+    def _motion(self, gray):
+        if self.gray is None:
+            return np.ones(len(self.tiles))
+        moving = cv2.absdiff(gray, self.gray) > self.diff_thres
+        energy = []
+        for x0, y0, x1, y1 in self.tiles:
+            block = moving[int(y0 * self.motion_scale):int(math.ceil(y1 * self.motion_scale)),
+                           int(x0 * self.motion_scale):int(math.ceil(x1 * self.motion_scale))]
+            energy.append(block.mean() if block.size else 0.0)
+        return np.array(energy)
+
+    # 每个块负责的上一帧目标数：每个目标只算在完整包含它、中心离它最近的一个块里
+    # 没有块能完整包含的大目标由整幅画面负责，不占用块的名额
+    def _tracks(self):
+        counts = np.zeros(len(self.tiles), dtype=np.int64)
+        for cls, (left, top, w, h), conf in self.detections:
+            cx, cy = left + w / 2, top + h / 2
+            best, best_distance = None, None
+            for i, (x0, y0, x1, y1) in enumerate(self.tiles):
+                if x0 <= left and y0 <= top and left + w <= x1 and top + h <= y1:
+                    distance = abs(cx - (x0 + x1) / 2) + abs(cy - (y0 + y1) / 2)
+                    if best is None or distance < best_distance:
+                        best, best_distance = i, distance
+            if best is None and not self.full_frame:
+                best = next((i for i, (x0, y0, x1, y1) in enumerate(self.tiles)
+                             if x0 <= cx < x1 and y0 <= cy < y1), None)
+            if best is not None:
+                counts[best] += 1
+        return counts
+
+    # 选出本帧推理的块：有目标的块优先，其次是运动能量高的块，最后是到期刷新的块（最久没推理的优先）
+    # 名额不够时留一个给最久没推理的到期块，保证静止的目标也能在有限帧内被发现
+    def _select(self, energy, tracks):
+        stale = self.frame - self.last_run
+        candidates = [i for i in range(len(self.tiles))
+                      if tracks[i] > 0 or energy[i] >= self.motion_thres or stale[i] >= self.refresh]
+        candidates.sort(key=lambda i: (tracks[i] == 0, -energy[i] if energy[i] >= self.motion_thres else 0,
+                                       -stale[i]))
+        selected = candidates[:self.max_tiles]
+        due = [i for i in candidates[self.max_tiles:] if stale[i] >= self.refresh]
+        if due and self.max_tiles > 1 and not any(stale[i] >= self.refresh for i in selected):
+            selected[-1] = max(due, key=lambda i: stale[i])
+        return selected
+
+    # 检测框是否贴着块的内侧边界（不是图像边界），贴着说明可能被截断
+    def _truncated(self, box, tile, margin=2):
+        left, top, w, h = box
+        x0, y0, x1, y1 = tile
+        img_h, img_w = self.shape
+        return (x0 > 0 and left <= x0 + margin) or (y0 > 0 and top <= y0 + margin) or \
+            (x1 < img_w and left + w >= x1 - margin) or (y1 < img_h and top + h >= y1 - margin)
+
+    # 跨块NMS：同类别的框按(完整优先, 本帧检出优先, 置信度)排序，IoU或交集占较小框比例超过阈值的去掉
+    # candidates为(检测结果, 是否被截断, 沿用帧数)，返回保留的检测结果和各自的沿用帧数
+    def _merge(self, candidates):
+        candidates.sort(key=lambda c: (c[1], c[2], -c[0][2]))
+        kept = []
+        ages = []
+        for detection, truncated, age in candidates:
+            cls, (left, top, w, h), conf = detection
+            duplicate = False
+            for k_cls, (k_left, k_top, k_w, k_h), k_conf in kept:
+                if k_cls != cls:
+                    continue
+                iw = min(left + w, k_left + k_w) - max(left, k_left)
+                ih = min(top + h, k_top + k_h) - max(top, k_top)
+                if iw <= 0 or ih <= 0:
+                    continue
+                inter = iw * ih
+                if inter / (w * h + k_w * k_h - inter) >= self.iou_thres or \
+                        inter / max(min(w * h, k_w * k_h), 1) >= self.ios_thres:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(detection)
+                ages.append(age)
+        return kept, ages
+
+    # 与YOLOv5Detector.predict相同的输出格式
+    def predict(self, img):
+        if self.shape != img.shape[:2]:
+            self._make_tiles(img.shape)
+        small = cv2.resize(img, None, fx=self.motion_scale, fy=self.motion_scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        energy = self._motion(gray)
+        tracks = self._tracks()
+        selected = self._select(energy, tracks)
+        self.gray = gray
+        self.frame += 1
+        self.tile_count += len(selected)
+        self.moving += int((energy >= self.motion_thres).sum())
+        self.tracked += int((tracks > 0).sum())
+
+        # 整幅画面和选中的块在同一个batch里，letterbox到相同的输入尺寸
+        regions = [(0, 0, img.shape[1], img.shape[0])] if self.full_frame else []
+        regions += [self.tiles[i] for i in selected]
+        t = time.perf_counter()
+        results = self.detector.predict_batch([img[y0:y1, x0:x1] for x0, y0, x1, y1 in regions])
+        elapsed = time.perf_counter() - t
+        self.infer_time = elapsed if self.infer_time == 0 else self.infer_time * 0.9 + elapsed * 0.1
+        self.last_run[selected] = self.frame
+
+        candidates = []
+        for region, detections in zip(regions, results):
+            x0, y0 = region[:2]
+            for cls, (left, top, w, h), conf in detections:
+                box = [left + x0, top + y0, w, h]
+                candidates.append(((cls, box, conf), self._truncated(box, region), 0))
+        # 没推理的块里沿用上一帧的检测结果（块数超过上限时），中心不在本帧推理过的块内的才保留
+        # 沿用没有新的证据，连续沿用refresh帧后丢弃，避免目标离开后留下幽灵框
+        tiles = [self.tiles[i] for i in selected]
+        for detection, age in zip(self.detections, self.ages):
+            cls, (left, top, w, h), conf = detection
+            cx, cy = left + w / 2, top + h / 2
+            if not any(x0 <= cx < x1 and y0 <= cy < y1 for x0, y0, x1, y1 in tiles):
+                if age + 1 >= self.refresh:
+                    self.expired += 1
+                    continue
+                candidates.append((detection, False, age + 1))
+        detections, self.ages = self._merge(candidates)
+        self.detections = detections
+        self.carried += sum(age > 0 for age in self.ages)
+
+        if self.ui and detections:
+            annotator = Annotator(img, line_width=3, example=str(self.detector.names))
+            for cls, (left, top, w, h), conf in detections:
+                annotator.box_label((left, top, left + w, top + h), f'{cls} {conf:.2f}', color=self.colors[cls])
+        return detections
+
+    def format_stats(self):
+        frames = max(self.frame, 1)
+        return 'tiles %d grid %dx%d, %.2f run/frame (moving %.2f, tracked %.2f) carried:%d expired:%d infer %.1fms' % (
+            len(self.tiles), self.tile_size[0], self.tile_size[1], self.tile_count / frames, self.moving / frames,
+            self.tracked / frames, self.carried, self.expired, self.infer_time * 1e3)
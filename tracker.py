@@ -0,0 +1,324 @@
+import threading
+import time
+
+import numpy as np
+
+from RM_serial_py.ser_api import mapping_table
+
+
+# 把(n, 2)的地图坐标限制在[0, 宽]、[0, 高]内，外推或投影到场外的点打包成无符号坐标时会出错
+def clip_points(points, bounds):
+    if bounds is None:
+        return points
+    return np.clip(points, 0, bounds)
+
+
+# 机器人坐标滤波器（滑动窗口均值滤波）
+# 所有机器人的滑动窗口存放在一个(机器人数, 窗口, 2)的numpy环形缓冲区中，异常值剔除、均值和超时清空都是向量化计算
+# 主循环和串口发送线程会同时读写，所有操作加锁，get_all_data返回的是当时的快照
+class Filter:
+    def __init__(self, window_size, max_inactive_time=2.0, guess_list=None, names=tuple(mapping_table), bounds=None):
+        self.window_size = window_size
+        self.max_inactive_time = max_inactive_time
+        self.bounds = bounds  # 地图的(宽, 高)，输出坐标限制在地图内，None为不限制
+        self.guess_list = guess_list if guess_list is not None else {}  # 盲区预测标志，识别到为False，超时为True
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        num = len(self.names)
+        self.window = np.zeros((num, window_size, 2))  # 存储滑动窗口内的数据
+        self.count = np.zeros(num, dtype=np.int64)  # 滑动窗口内的数据个数
+        self.head = np.zeros(num, dtype=np.int64)  # 下一个数据写入的位置
+        self.last_update = np.zeros(num)  # 存储每个机器人的最后更新时间
+        self.seen = np.zeros(num, dtype=bool)  # 是否识别到过该机器人
+        self.lock = threading.Lock()
+
+    # 添加机器人坐标数据
+    def add_data(self, name, x, y, threshold=100000.0, t=None):  # 阈值单位为mm，实测没啥用，不如直接给大点
+        self.add_batch([name], [x], [y], threshold, t)
+
+    # 一次添加一帧内所有机器人的坐标数据，t为图像采集时间
+    def add_batch(self, names, xs, ys, threshold=100000.0, t=None):
+        index = np.array([self.index.get(name, -1) for name in names], dtype=np.int64)
+        points = np.stack([np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)], axis=1)
+        points = points[index >= 0]
+        index = index[index >= 0]
+        now = time.time() if t is None else t
+        with self.lock:
+            # 同一帧内同一机器人出现多次时按顺序分批写入
+            while len(index):
+                index_u, first = np.unique(index, return_index=True)
+                self._append(index_u, points[first], now, threshold)
+                rest = np.ones(len(index), dtype=bool)
+                rest[first] = False
+                index, points = index[rest], points[rest]
+
+    def _append(self, index, points, now, threshold):
+        # 计算当前坐标与前一个坐标的均方，超过阈值可能是异常值，不将其添加到数据中
+        last = self.window[index, (self.head[index] - 1) % self.window_size]
+        msd = ((points - last) ** 2).sum(axis=1) / 2.0
+        keep = (self.count[index] < 2) | (msd <= threshold)
+        index, points = index[keep], points[keep]
+
+        # 将坐标数据添加到滑动窗口中
+        self.window[index, self.head[index]] = points
+        self.head[index] = (self.head[index] + 1) % self.window_size
+        self.count[index] = np.minimum(self.count[index] + 1, self.window_size)
+        self.last_update[index] = now  # 更新最后更新时间
+        self.seen[index] = True
+        for i in index:
+            self.guess_list[self.names[i]] = False
+
+    # 过滤计算滑动窗口平均值
+    def filter_data(self, name):
+        i = self.index.get(name)
+        with self.lock:
+            if i is None or not self.seen[i] or self.count[i] < self.window_size:
+                return None  # 不足以进行滤波
+            x_avg, y_avg = self.window[i].mean(axis=0)
+        return x_avg, y_avg
+
+    # 获取所有机器人坐标，均值滤波不做延迟补偿，latency参数仅为与KalmanTracker接口一致
+    def get_all_data(self, latency=0.0):
+        now = time.time()
+        with self.lock:
+            # 超过max_inactive_time没识别到机器人将会清空缓冲区，并进行盲区预测
+            inactive = self.seen & (now - self.last_update > self.max_inactive_time)
+            self.count[inactive] = 0
+            self.head[inactive] = 0
+            active = self.seen & ~inactive
+            # 计算滑动窗口内的坐标平均值，数据不足的为None
+            full = self.count == self.window_size
+            means = clip_points(self.window.mean(axis=1), self.bounds)
+            for i in np.flatnonzero(inactive):
+                self.guess_list[self.names[i]] = True
+            filtered_d = {}
+            for i in np.flatnonzero(active):
+                # 识别到机器人，不进行盲区预测
+                self.guess_list[self.names[i]] = False
+                filtered_d[self.names[i]] = (means[i, 0], means[i, 1]) if full[i] else None
+        # 返回所有当前识别到的机器人及其坐标的均值
+        return filtered_d
+
+
+# 匀速模型卡尔曼滤波跟踪器，所有机器人的状态[x, y, vx, vy]放在一个矩阵中统一预测和更新
+# 第一次识别到就有输出；短暂遮挡时按速度外推（最多max_predict_time秒），超过max_inactive_time才进入盲区预测
+# 接口与Filter一致，可以直接替换
+class KalmanTracker:
+    def __init__(self, max_inactive_time=2.0, guess_list=None, names=tuple(mapping_table),
+                 measure_noise=20.0, accel_noise=300.0, init_speed=200.0, gate=25.0, max_predict_time=0.5,
+                 bounds=None):
+        self.max_inactive_time = max_inactive_time
+        self.bounds = bounds  # 地图的(宽, 高)，外推后的坐标限制在地图内，None为不限制
+        self.guess_list = guess_list if guess_list is not None else {}  # 盲区预测标志，识别到为False，超时为True
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.measure_noise = measure_noise  # 观测噪声标准差（地图像素）
+        self.accel_noise = accel_noise  # 加速度噪声标准差（地图像素/s^2）
+        self.init_speed = init_speed  # 初始速度不确定度（地图像素/s）
+        self.gate = gate  # 马氏距离平方门限，超过视为异常观测
+        self.max_predict_time = max_predict_time  # 最长外推时间，之后保持位置不动
+        num = len(self.names)
+        self.x = np.zeros((num, 4))  # 状态[x, y, vx, vy]
+        self.P = np.tile(np.eye(4), (num, 1, 1))  # 状态协方差
+        self.t = np.zeros(num)  # 状态对应的时间
+        self.last_update = np.zeros(num)  # 最后一次观测的时间
+        self.seen = np.zeros(num, dtype=bool)  # 是否有有效状态
+        self.lock = threading.Lock()
+
+    # 把index对应机器人的状态预测到时间now，返回预测状态和协方差（不修改内部状态）
+    def _predict(self, index, now):
+        dt = np.maximum(now - self.t[index], 0.0)
+        F = np.tile(np.eye(4), (len(index), 1, 1))
+        F[:, 0, 2] = dt
+        F[:, 1, 3] = dt
+        x = np.einsum('nij,nj->ni', F, self.x[index])
+        P = F @ self.P[index] @ F.transpose(0, 2, 1)
+        # 白噪声加速度模型的过程噪声
+        q = self.accel_noise ** 2
+        dt2, dt3, dt4 = dt ** 2, dt ** 3 / 2, dt ** 4 / 4
+        for a, b in ((0, 2), (1, 3)):
+            P[:, a, a] += q * dt4
+            P[:, a, b] += q * dt3
+            P[:, b, a] += q * dt3
+            P[:, b, b] += q * dt2
+        return x, P
+
+    # 添加机器人坐标数据
+    def add_data(self, name, x, y, threshold=None, t=None):
+        self.add_batch([name], [x], [y], threshold, t)
+
+    # 一次添加一帧内所有机器人的坐标数据，t为图像采集时间；threshold参数仅为与Filter接口一致
+    def add_batch(self, names, xs, ys, threshold=None, t=None):
+        index = np.array([self.index.get(name, -1) for name in names], dtype=np.int64)
+        z = np.stack([np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)], axis=1)
+        z = z[index >= 0]
+        index = index[index >= 0]
+        now = time.time() if t is None else t
+        with self.lock:
+            # 同一帧内同一机器人出现多次时按顺序分批更新
+            while len(index):
+                index_u, first = np.unique(index, return_index=True)
+                self._update(index_u, z[first], now)
+                rest = np.ones(len(index), dtype=bool)
+                rest[first] = False
+                index, z = index[rest], z[rest]
+
+    def _update(self, index, z, now):
+        # 新出现或已超时的机器人直接用观测初始化
+        stale = ~self.seen[index] | (now - self.last_update[index] > self.max_inactive_time)
+        x, P = self._predict(index, now)
+
+        # 卡尔曼更新，H取状态中的位置
+        S = P[:, :2, :2] + np.eye(2) * self.measure_noise ** 2
+        S_inv = np.linalg.inv(S)
+        y = z - x[:, :2]
+        d2 = np.einsum('ni,nij,nj->n', y, S_inv, y)
+        K = P[:, :, :2] @ S_inv  # (n, 4, 2)
+        x = x + np.einsum('nij,nj->ni', K, y)
+        P = P - K @ P[:, :2, :]
+
+        # 门限外的观测：刚更新过的认为是误识别丢弃，外推太久的认为是重新出现，重新初始化
+        outlier = ~stale & (d2 > self.gate)
+        reset = stale | (outlier & (now - self.last_update[index] > self.max_predict_time))
+        accept = ~outlier | reset
+        x[reset] = np.concatenate([z[reset], np.zeros((reset.sum(), 2))], axis=1)
+        P[reset] = np.diag([self.measure_noise ** 2] * 2 + [self.init_speed ** 2] * 2)
+
+        index = index[accept]
+        self.x[index] = x[accept]
+        self.P[index] = P[accept]
+        self.t[index] = now
+        self.last_update[index] = now
+        self.seen[index] = True
+        for i in index:
+            self.guess_list[self.names[i]] = False
+
+    # 过滤计算当前估计位置
+    def filter_data(self, name):
+        data = self.get_all_data()
+        return data.get(name)
+
+    # 获取所有机器人坐标，latency为延迟补偿时间（秒），返回外推到 当前时间+latency 的位置
+    def get_all_data(self, latency=0.0):
+        now = time.time()
+        with self.lock:
+            # 超过max_inactive_time没识别到机器人将会进行盲区预测
+            inactive = self.seen & (now - self.last_update > self.max_inactive_time)
+            self.seen[inactive] = False
+            for i in np.flatnonzero(inactive):
+                self.guess_list[self.names[i]] = True
+            index = np.flatnonzero(self.seen)
+            # 最多外推max_predict_time，避免长时间遮挡后位置飘走
+            target = np.minimum(now + latency, self.last_update[index] + self.max_predict_time)
+            x, _ = self._predict(index, target)
+            points = clip_points(x[:, :2], self.bounds)
+            filtered_d = {}
+            for i, point in zip(index, points):
+                # 识别到机器人，不进行盲区预测
+                self.guess_list[self.names[i]] = False
+                filtered_d[self.names[i]] = (point[0], point[1])
+        return filtered_d
+
+
+# 机器人框跟踪中的一条轨迹，按装甲板识别结果累积ID投票
+class CarTrack:
+    def __init__(self, track_id, box, frame):
+        self.id = track_id
+        self.box = box  # (left, top, w, h)
+        self.votes = {}  # 装甲板类别 -> 衰减累积的置信度
+        self.point = None  # 装甲板待仿射变化的点在机器人框中的相对位置 (x/w, y/h)
+        self.last_armor = -1  # 上次做装甲板识别的帧号
+        self.last_seen = frame
+
+    # 当前ID和置信度（该ID票数占总票数的比例）
+    def identity(self):
+        if not self.votes:
+            return None, 0.0
+        name = max(self.votes, key=self.votes.get)
+        return name, self.votes[name] / sum(self.votes.values())
+
+    # 根据当前机器人框还原装甲板点
+    def armor_point(self):
+        left, top, w, h = self.box
+        return left + self.point[0] * w, top + self.point[1] * h
+
+
+# 机器人框的IoU跟踪：同一台机器人连续帧的框按IoU贪心关联成轨迹，每条轨迹保存装甲板ID投票
+# 只有新轨迹、ID置信度低或超过刷新间隔的轨迹才需要跑装甲板模型，其余沿用轨迹的ID和装甲板相对位置
+class CarTracker:
+    def __init__(self, iou_thres=0.3, max_missed=5, refresh=10, min_confidence=0.6, decay=0.8, max_refresh=1):
+        self.iou_thres = iou_thres
+        self.max_missed = max_missed  # 连续多少帧没关联上就删除轨迹
+        self.refresh = refresh  # 每隔多少帧强制重新识别一次装甲板
+        self.min_confidence = min_confidence  # ID置信度低于该值时每帧都识别
+        self.decay = decay  # 每次投票时旧票数的衰减系数
+        self.max_refresh = max_refresh  # 每帧最多定时刷新几条轨迹，避免同时出现的轨迹在同一帧一起刷新
+        self.tracks = []
+        self.next_id = 0
+        self.frame = 0
+        self.inferred = 0  # 跑了装甲板模型的机器人框数
+        self.reused = 0  # 沿用轨迹ID的机器人框数
+
+    @staticmethod
+    def iou(a, b):
+        w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+        h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+        if w <= 0 or h <= 0:
+            return 0.0
+        inter = w * h
+        return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+    # 关联一帧的机器人框，返回与boxes一一对应的轨迹
+    def update(self, boxes):
+        self.frame += 1
+        pairs = sorted(((self.iou(track.box, box), t, b) for t, track in enumerate(self.tracks)
+                        for b, box in enumerate(boxes)), reverse=True)
+        result = [None] * len(boxes)
+        used = set()
+        for score, t, b in pairs:
+            if score < self.iou_thres:
+                break
+            if t in used or result[b] is not None:
+                continue
+            used.add(t)
+            track = self.tracks[t]
+            track.box = boxes[b]
+            track.last_seen = self.frame
+            result[b] = track
+        for b, box in enumerate(boxes):
+            if result[b] is None:
+                result[b] = CarTrack(self.next_id, box, self.frame)
+                self.next_id += 1
+                self.tracks.append(result[b])
+        self.tracks = [track for track in self.tracks if self.frame - track.last_seen <= self.max_missed]
+        return result
+
+    # 这一帧需要跑装甲板模型的轨迹序号：新轨迹和ID置信度低的全部识别，到刷新间隔的按等待时间最多选max_refresh条
+    def select(self, tracks):
+        infer = []
+        due = []
+        for i, track in enumerate(tracks):
+            name, confidence = track.identity()
+            if name is None or track.point is None or confidence < self.min_confidence:
+                infer.append(i)
+            elif self.frame - track.last_armor >= self.refresh:
+                due.append(i)
+        due.sort(key=lambda i: tracks[i].last_armor)
+        infer.extend(due[:self.max_refresh])
+        self.inferred += len(infer)
+        self.reused += len(tracks) - len(infer)
+        return sorted(infer)
+
+    # 记录一次装甲板识别结果，point为装甲板点在原图中的坐标
+    def vote(self, track, name, conf, point):
+        for key in track.votes:
+            track.votes[key] *= self.decay
+        track.votes[name] = track.votes.get(name, 0.0) + conf
+        left, top, w, h = track.box
+        track.point = ((point[0] - left) / max(w, 1), (point[1] - top) / max(h, 1))
+        track.last_armor = self.frame
+
+    def format_stats(self):
+        total = max(self.inferred + self.reused, 1)
+        return 'car tracks:%d armor infer:%d reuse:%d (%.0f%%)' % (len(self.tracks), self.inferred, self.reused,
+                                                                   self.reused * 100 / total)
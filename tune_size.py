@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+
+from bench import summarize
+from detect_function import YOLOv5Detector
+
+
+# 从录像中收集机器人ROI：每隔stride帧跑一次机器人检测，按帧分组（与流水线一样一帧的ROI合成一个batch）
+def collect_crops(opt):
+    detector = YOLOv5Detector(opt.car_weights, img_size=(opt.car_size, opt.car_size), data=opt.car_data,
+                              conf_thres=0.1, iou_thres=0.5, max_det=14, device_preprocess=opt.device_preprocess)
+    capture = cv2.VideoCapture(opt.video)
+    groups = []
+    index = 0
+    while len(groups) < opt.frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        index += 1
+        if index % opt.stride:
+            continue
+        crops = []
+        for cls, (left, top, w, h), conf in detector.predict(frame):
+            if cls == 'car' and w > 0 and h > 0:
+                crops.append(np.ascontiguousarray(frame[max(top, 0):top + h, max(left, 0):left + w]))
+        if crops:
+            groups.append(crops)
+    capture.release()
+    return groups
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+# 以参考尺寸的结果为标注：召回率为参考装甲板被检出(IoU>=阈值)的比例，ID准确率为检出的装甲板中类别一致的比例
+def compare(reference, results, iou_thres=0.5):
+    total = matched = correct = 0
+    for ref, res in zip(reference, results):
+        used = set()
+        for cls, box, conf in ref:
+            total += 1
+            best, best_iou = None, iou_thres
+            for j, (cls_j, box_j, conf_j) in enumerate(res):
+                if j not in used and iou(box, box_j) >= best_iou:
+                    best, best_iou = j, iou(box, box_j)
+            if best is not None:
+                used.add(best)
+                matched += 1
+                correct += res[best][0] == cls
+    return matched / max(total, 1), correct / max(matched, 1), total
+
+
+# 按尺寸逐个测试装甲板模型：延迟为一帧所有ROI一个batch的推理耗时
+def sweep(opt, groups):
+    rows = []
+    reference = None
+    for size in sorted(set(opt.sizes + [opt.reference]), reverse=True):
+        weights = opt.armor_weights.format(size=size)  # engine模型输入尺寸固定，用{size}指定每个尺寸对应的模型
+        detector = YOLOv5Detector(weights, img_size=(size, size), data=opt.armor_data, conf_thres=0.4,
+                                  iou_thres=0.2, max_det=1, device_preprocess=opt.device_preprocess)
+        for crops in groups[:opt.warmup]:
+            detector.predict_batch(crops)
+        times = []
+        results = []
+        for crops in groups:
+            t = time.perf_counter()
+            results.extend(detector.predict_batch(crops))
+            times.append(time.perf_counter() - t)
+        if size == opt.reference:
+            reference = results
+        rows.append({'size': size, 'weights': weights, 'latency_ms': summarize(times), 'results': results})
+    for row in rows:
+        row['recall'], row['id_accuracy'], row['armors'] = compare(reference, row.pop('results'))
+        row['recall'] = round(row['recall'], 4)
+        row['id_accuracy'] = round(row['id_accuracy'], 4)
+    return sorted(rows, key=lambda row: row['size'])
+
+
+# 满足召回率和ID准确率要求的最小尺寸，都不满足时用参考尺寸
+def choose(rows, opt):
+    for row in rows:
+        if row['recall'] >= opt.min_recall and row['id_accuracy'] >= opt.min_id_accuracy:
+            return row['size']
+    return opt.reference
+
+
+# 把选出的尺寸写入main.py的user_armor_img_size，weights不为空时同时把装甲板模型换成该尺寸的模型
+def apply(path, size, weights=None):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+    text, n = re.subn(r'^user_armor_img_size = \d+', 'user_armor_img_size = %d' % size, text, flags=re.M)
+    if n != 1:
+        raise RuntimeError('%s 中没有找到 user_armor_img_size' % path)
+    if weights is not None:
+        text, n = re.subn(r"^weights_path_next = '[^']*'", "weights_path_next = '%s'" % weights, text, flags=re.M)
+        if n != 1:
+            raise RuntimeError('%s 中没有找到 weights_path_next' % path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser(description='装甲板模型输入尺寸离线测试：在录像的机器人ROI上比较不同尺寸的延迟、召回率和ID准确率')
+    parser.add_argument('--video', required=True, help='录像文件，如main.py保存的save_video/.../raw/screen_*.avi')
+    parser.add_argument('--car-weights', default='models/car.engine', help='机器人检测模型')
+    parser.add_argument('--armor-weights', default='models/armor.onnx',
+                        help='装甲板检测模型，engine模型可写成models/armor_{size}.engine')
+    parser.add_argument('--car-data', default='yaml/car.yaml')
+    parser.add_argument('--armor-data', default='yaml/armor.yaml')
+    parser.add_argument('--car-size', type=int, default=640, help='机器人检测模型输入尺寸')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[160, 224, 320, 416, 640], help='测试的装甲板模型输入尺寸')
+    parser.add_argument('--reference', type=int, default=640, help='作为标注的参考尺寸')
+    parser.add_argument('--frames', type=int, default=300, help='参与测试的帧数（有机器人的帧）')
+    parser.add_argument('--stride', type=int, default=5, help='每隔多少帧取一帧')
+    parser.add_argument('--warmup', type=int, default=10, help='预热帧数，不计入延迟')
+    parser.add_argument('--min-recall', type=float, default=0.95, help='相对参考尺寸的最低召回率')
+    parser.add_argument('--min-id-accuracy', type=float, default=0.95, help='最低ID准确率')
+    parser.add_argument('--device-preprocess', type=int, default=0, help='在推理设备上做letterbox预处理')
+    parser.add_argument('--apply', default='', help='把选出的尺寸写入该配置文件（如main.py）')
+    parser.add_argument('--out', default='', help='JSON结果保存路径，不指定则只打印')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    groups = collect_crops(opt)
+    if not groups:
+        raise RuntimeError('录像中没有检测到机器人 %s' % opt.video)
+    rows = sweep(opt, groups)
+    size = choose(rows, opt)
+    result = {'video': opt.video, 'frames': len(groups), 'crops': sum(len(crops) for crops in groups),
+              'crop_size_median': [int(np.median([crop.shape[i] for crops in groups for crop in crops])) for i in (1, 0)],
+              'sizes': rows, 'chosen': size}
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if opt.out:
+        os.makedirs(os.path.dirname(opt.out) or '.', exist_ok=True)
+        with open(opt.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if opt.apply:
+        weights = opt.armor_weights.format(size=size)
+        if '{size}' in opt.armor_weights:
+            # 每个尺寸有各自的模型，连同模型路径一起写入
+            apply(opt.apply, size, weights)
+            print('已写入 %s: user_armor_img_size = %d, weights_path_next = %s' % (opt.apply, size, weights))
+        elif weights.endswith('.engine'):
+            # engine模型输入尺寸固定，只改尺寸会用错误的输入形状加载模型
+            print('未写入 %s: %s 的输入尺寸固定，请先导出 %d 尺寸的engine模型，再用 --armor-weights '
+                  '指定带{size}的路径（如models/armor_{size}.engine）重新运行' % (opt.apply, weights, size))
+        else:
+            apply(opt.apply, size)
+            print('已写入 %s: user_armor_img_size = %d' % (opt.apply, size))
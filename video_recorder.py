@@ -0,0 +1,90 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+# 编码进程：从共享内存槽位取帧写入视频文件，写完把槽位还回空闲队列
+def encode_worker(path, fourcc, fps, size, shm_name, slots, todo, free, written):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots, size[1], size[0], 3), dtype=np.uint8, buffer=shm.buf)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    if not writer.isOpened():
+        print('无法创建录像文件 %s (%s)' % (path, fourcc))
+    while True:
+        index = todo.get()
+        if index is None:
+            break
+        writer.write(frames[index])
+        with written.get_lock():
+            written.value += 1
+        free.put(index)
+    writer.release()
+    del frames
+    shm.close()
+
+
+# 异步录像：调用线程只把帧缩放进共享内存的空闲槽位，编码和写盘在单独的进程
+# 按目标帧率抽帧，与检测帧率无关；编码进程跟不上时槽位用完，直接丢帧并计数，检测线程永远不会被录像阻塞
+class VideoRecorder:
+    def __init__(self, path, size, fps=10, fourcc='XVID', slots=4, name='video'):
+        self.path = path
+        self.size = tuple(size)  # (宽, 高)
+        self.fps = fps
+        self.name = name
+        self.interval = 1.0 / fps
+        self.next_time = 0.0  # 下一帧最早的写入时间
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.size[0] * self.size[1] * 3)
+        self.frames = np.ndarray((slots, self.size[1], self.size[0], 3), dtype=np.uint8, buffer=self.shm.buf)
+        self.todo = mp.Queue()
+        self.free = mp.Queue()
+        for index in range(slots):
+            self.free.put(index)
+        self.written = mp.Value('L', 0)  # 编码进程已写入帧数
+        self.submitted = 0  # 已交给编码进程的帧数
+        self.skipped = 0  # 按目标帧率抽掉的帧数
+        self.dropped = 0  # 编码进程跟不上而丢弃的帧数
+        self.process = mp.Process(target=encode_worker, args=(path, fourcc, fps, self.size, self.shm.name, slots,
+                                                              self.todo, self.free, self.written), daemon=True)
+        self.process.start()
+
+    # 提交一帧，尺寸不同时缩放到录像尺寸；返回是否被录下
+    def write(self, image):
+        now = time.monotonic()
+        if now < self.next_time:
+            self.skipped += 1
+            return False
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        # 按周期累加，落后时从当前时间重新计
+        self.next_time = max(self.next_time + self.interval, now)
+        if image.shape[1::-1] == self.size:
+            np.copyto(self.frames[index], image)
+        else:
+            cv2.resize(image, self.size, dst=self.frames[index])
+        self.todo.put(index)
+        self.submitted += 1
+        return True
+
+    def format_stats(self):
+        return '%s written:%d skip:%d drop:%d' % (self.name, self.written.value, self.skipped, self.dropped)
+
+    # 等待编码进程写完已提交的帧后退出
+    def release(self):
+        if self.process is None:
+            return
+        self.todo.put(None)
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        del self.frames
+        self.shm.close()
+        self.shm.unlink()